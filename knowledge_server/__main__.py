@@ -4,138 +4,75 @@ Main entry point for the Knowledge Server.
 """
 
 import argparse
+import importlib
 import sys
+from types import ModuleType
+from typing import Dict, List, Optional
 
-from knowledge_server.config import settings
 
+# Available commands and their help text. Each command lives in its own
+# module under knowledge_server.commands, and only the selected one is
+# imported, so `--help` and argument errors stay cheap.
+COMMANDS: Dict[str, str] = {
+    "serve": "Run the API server",
+    "scrape": "Scrape URLs",
+    "add": "Add a document",
+    "search": "Search knowledge base",
+    "add-batch": "Add documents from a JSONL file",
+    "search-batch": "Run one search per line of a queries file",
+}
 
-def main() -> int:
-    """Main entry point."""
-    parser = argparse.ArgumentParser(
-        description="Knowledge Server - RAG-based knowledge management"
-    )
-    
-    subparsers = parser.add_subparsers(dest="command", help="Available commands")
-    
-    # Server command
-    server_parser = subparsers.add_parser("serve", help="Run the API server")
-    server_parser.add_argument(
-        "--host", default=settings.host, help="Server host"
-    )
-    server_parser.add_argument(
-        "--port", type=int, default=settings.port, help="Server port"
+
+def _load_command(name: str) -> ModuleType:
+    """Import the module implementing a command."""
+    return importlib.import_module(
+        f"knowledge_server.commands.{name.replace('-', '_')}"
     )
-    
-    # Scrape command
-    scrape_parser = subparsers.add_parser("scrape", help="Scrape URLs")
-    scrape_parser.add_argument(
-        "urls", nargs="+", help="URLs to scrape"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Main entry point."""
+    commands_help = "\n".join(
+        f"  {name:<14}{help_text}" for name, help_text in COMMANDS.items()
     )
-    scrape_parser.add_argument(
-        "--output", "-o", help="Output file path"
+    parser = argparse.ArgumentParser(
+        description="Knowledge Server - RAG-based knowledge management",
+        epilog=f"Available commands:\n{commands_help}",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        add_help=False,
     )
-    scrape_parser.add_argument(
-        "--follow-links", action="store_true", help="Follow links on pages"
+    parser.add_argument(
+        "-h", "--help", action="store_true", help="Show this help message and exit"
     )
-    
-    # Add document command
-    add_parser = subparsers.add_parser("add", help="Add a document")
-    add_parser.add_argument("--id", required=True, help="Document ID")
-    add_parser.add_argument("--title", required=True, help="Document title")
-    add_parser.add_argument("--content", required=True, help="Document content")
-    add_parser.add_argument("--url", help="Source URL")
-    
-    # Search command
-    search_parser = subparsers.add_parser("search", help="Search knowledge base")
-    search_parser.add_argument("query", help="Search query")
-    search_parser.add_argument(
-        "--top-k", type=int, default=5, help="Number of results"
+    parser.add_argument(
+        "command", nargs="?", metavar="command", help="Command to run"
     )
-    
-    args = parser.parse_args()
-    
-    if args.command == "serve":
-        from knowledge_server.api.server import run_server
-        settings.ensure_directories()
-        run_server(host=args.host, port=args.port)
-        return 0
-    
-    elif args.command == "scrape":
-        from knowledge_server.scrapy_server.runner import ScrapyRunner
-        
-        runner = ScrapyRunner()
-        results = runner.scrape_urls(args.urls, follow_links=args.follow_links)
-        
-        if args.output:
-            import json
-            with open(args.output, "w") as f:
-                json.dump(results, f, indent=2)
-            print(f"Saved {len(results)} results to {args.output}")
-        else:
-            for result in results:
-                print(f"URL: {result.get('url')}")
-                print(f"Title: {result.get('title')}")
-                print(f"Content: {result.get('content', '')[:200]}...")
-                print("-" * 50)
-        
-        return 0
-    
-    elif args.command == "add":
-        from knowledge_server.vector_db.vector_store import VectorStore
-        from knowledge_server.graph_db.graph_store import GraphStore
-        from knowledge_server.rag.rag_engine import RAGEngine
-        
-        settings.ensure_directories()
-        
-        vector_store = VectorStore(
-            dimension=settings.vector_dimension,
-            db_path=settings.get_vector_db_path(),
-        )
-        graph_store = GraphStore(settings.get_graph_db_path())
-        engine = RAGEngine(vector_store, graph_store, settings.embedding_model)
-        
-        engine.add_document(
-            doc_id=args.id,
-            title=args.title,
-            content=args.content,
-            url=args.url,
-        )
-        
-        vector_store.save()
-        print(f"Added document: {args.id}")
-        
-        return 0
-    
-    elif args.command == "search":
-        from knowledge_server.vector_db.vector_store import VectorStore
-        from knowledge_server.graph_db.graph_store import GraphStore
-        from knowledge_server.rag.rag_engine import RAGEngine
-        
-        settings.ensure_directories()
-        
-        vector_store = VectorStore(
-            dimension=settings.vector_dimension,
-            db_path=settings.get_vector_db_path(),
-        )
-        graph_store = GraphStore(settings.get_graph_db_path())
-        engine = RAGEngine(vector_store, graph_store, settings.embedding_model)
-        
-        results = engine.retrieve(args.query, args.top_k)
-        
-        print(f"Search results for: {args.query}")
-        print("=" * 50)
-        
-        for i, result in enumerate(results, 1):
-            print(f"{i}. Score: {result['score']:.4f}")
-            if result.get("content"):
-                print(f"   Content: {result['content'][:200]}...")
-            print()
-        
-        return 0
-    
-    else:
+
+    # Only the command name is parsed here; the rest is handed to the
+    # selected command's parser.
+    args, remaining = parser.parse_known_args(argv)
+
+    if args.command is None:
         parser.print_help()
-        return 1
+        return 0 if args.help else 1
+
+    if args.command not in COMMANDS:
+        parser.error(
+            f"invalid command '{args.command}' (choose from {', '.join(COMMANDS)})"
+        )
+
+    command = _load_command(args.command)
+    command_parser = argparse.ArgumentParser(
+        prog=f"{parser.prog} {args.command}",
+        description=COMMANDS[args.command],
+    )
+    command.add_arguments(command_parser)
+
+    if args.help:
+        remaining.append("--help")
+    command_args = command_parser.parse_args(remaining)
+
+    return command.run(command_args)
 
 
 if __name__ == "__main__":
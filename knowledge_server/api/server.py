@@ -2,16 +2,22 @@
 FastAPI server for the Knowledge Server.
 """
 
+import asyncio
+import hashlib
 import os
 from contextlib import asynccontextmanager
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request
 from pydantic import BaseModel, Field
 
+from knowledge_server.config import get_settings
 from knowledge_server.vector_db.vector_store import VectorStore
 from knowledge_server.graph_db.graph_store import GraphStore
+from knowledge_server.rag.batching import MicroBatcher
+from knowledge_server.rag.model_cache import get_embedder
 from knowledge_server.rag.rag_engine import RAGEngine
+from knowledge_server.rag.reranker import AsyncReranker
 
 
 # Request/Response models
@@ -27,6 +33,12 @@ class DocumentRequest(BaseModel):
     )
 
 
+class DocumentBatchRequest(BaseModel):
+    """Request model for adding several documents at once."""
+    
+    documents: List[DocumentRequest] = Field(..., description="Documents to add")
+
+
 class EntityRequest(BaseModel):
     """Request model for adding an entity."""
     
@@ -54,6 +66,15 @@ class SearchRequest(BaseModel):
     use_reranker: Optional[bool] = Field(None, description="Use reranking (overrides default)")
 
 
+class SearchBatchRequest(BaseModel):
+    """Request model for running several searches at once."""
+    
+    queries: List[str] = Field(..., description="Search queries")
+    top_k: int = Field(5, description="Number of results to return per query")
+    include_graph: bool = Field(True, description="Include graph context")
+    use_reranker: Optional[bool] = Field(None, description="Use reranking (overrides default)")
+
+
 class ScrapeRequest(BaseModel):
     """Request model for scraping."""
     
@@ -67,6 +88,7 @@ class RetrievalResult(BaseModel):
     """Response model for retrieval results."""
     
     id: int
+    doc_id: Optional[str] = None
     score: float
     content: Optional[str]
     entities: Optional[List[Dict[str, Any]]] = None
@@ -81,50 +103,156 @@ class SearchResponse(BaseModel):
     graph_results: Optional[Dict[str, Any]] = None
 
 
-# Global state
-rag_engine: Optional[RAGEngine] = None
+class SearchBatchResponse(BaseModel):
+    """Response model for batch search."""
+    
+    results: List[List[RetrievalResult]]
+
+
+def _retrieval_result(result: Dict[str, Any]) -> RetrievalResult:
+    """Build the response model for one retrieval result."""
+    return RetrievalResult(
+        id=result["id"],
+        doc_id=result.get("doc_id"),
+        score=result["score"],
+        content=result.get("content"),
+        entities=result.get("entities"),
+        original_score=result.get("original_score"),
+        reranked=result.get("reranked"),
+    )
+
+
+def get_rag_engine(request: Request) -> RAGEngine:
+    """Get the RAG engine of the application handling the request."""
+    state = request.app.state
+    engine = getattr(state, "rag_engine", None)
+    if engine is None:
+        init_error = getattr(state, "init_error", None)
+        if init_error is not None:
+            raise HTTPException(
+                status_code=500,
+                detail=f"RAG engine failed to initialize: {init_error}",
+            )
+        raise HTTPException(
+            status_code=503,
+            detail="RAG engine is still initializing",
+            headers={"Retry-After": "1"},
+        )
+    return engine
+
+
+def _call_locked(engine: RAGEngine, fn, args, kwargs) -> Any:
+    """Call a store function while holding the engine lock."""
+    with engine.lock:
+        return fn(*args, **kwargs)
+
+
+async def _locked(engine: RAGEngine, fn, *args, **kwargs) -> Any:
+    """
+    Call a store function under the engine lock in a worker thread.
+    
+    Batch inserts hold the lock for a while, so waiting for it on the
+    event loop would stall every other request.
+    """
+    return await asyncio.to_thread(_call_locked, engine, fn, args, kwargs)
 
 
-def get_rag_engine() -> RAGEngine:
-    """Get the RAG engine instance."""
-    global rag_engine
-    if rag_engine is None:
-        raise HTTPException(status_code=500, detail="RAG engine not initialized")
-    return rag_engine
+async def _initialize_engine(app: FastAPI, vector_path: str, graph_path: str) -> None:
+    """Load the stores and models in worker threads and publish the engine."""
+    settings = get_settings()
+    try:
+        # Opening the stores and loading the model are independent and
+        # blocking, so run them side by side off the event loop
+        vector_store, graph_store, embedder = await asyncio.gather(
+            asyncio.to_thread(
+                VectorStore,
+                dimension=settings.vector_dimension,
+                db_path=vector_path,
+                dtype=settings.vector_dtype,
+                exact_search_max=settings.vector_exact_search_max,
+            ),
+            asyncio.to_thread(GraphStore, graph_path),
+            asyncio.to_thread(
+                get_embedder,
+                settings.embedding_model,
+                settings.embedding_backend,
+                settings.embedding_onnx_file,
+            ),
+        )
+        engine = await asyncio.to_thread(
+            RAGEngine,
+            vector_store,
+            graph_store,
+            embedding_model=settings.embedding_model,
+            embedder=embedder,
+            use_reranker=settings.use_reranker,
+            reranker_model=settings.reranker_model if settings.use_reranker else None,
+            reranker_prune_ratio=settings.reranker_prune_ratio,
+        )
+    except Exception as e:
+        app.state.init_error = e
+        raise
+    
+    # Coalesce query embeddings from concurrent /search requests
+    app.state.embedding_batcher = MicroBatcher(
+        engine.embed_queries, max_batch=32, max_wait=0.02
+    )
+    await app.state.embedding_batcher.start()
+    
+    # Batch reranking of concurrent /search requests in the same way
+    if engine.reranker is not None:
+        engine.async_reranker = AsyncReranker(engine.reranker)
+        await engine.async_reranker.start()
+    
+    app.state.embedder = embedder
+    app.state.rag_engine = engine
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown."""
-    global rag_engine
-    
     # Initialize components on startup
     db_path = os.environ.get("KNOWLEDGE_DB_PATH", "./data")
     vector_path = os.path.join(db_path, "vector_store")
     graph_path = os.path.join(db_path, "graph_store")
     
-    os.makedirs(db_path, exist_ok=True)
-    
-    vector_store = VectorStore(dimension=384, db_path=vector_path)
-    graph_store = GraphStore(graph_path)
-    
-    # Get reranker settings from environment
-    use_reranker = os.environ.get("KNOWLEDGE_USE_RERANKER", "false").lower() == "true"
-    reranker_model = os.environ.get("KNOWLEDGE_RERANKER_MODEL", "ms-marco-MiniLM-L-6-v2")
+    settings = get_settings()
+    app.state.rag_engine = None
+    app.state.embedding_batcher = None
+    app.state.init_error = None
     
-    rag_engine = RAGEngine(
-        vector_store, 
-        graph_store,
-        use_reranker=use_reranker,
-        reranker_model=reranker_model if use_reranker else None,
+    # Accept connections right away; engine routes return 503 until ready
+    init_task = asyncio.create_task(
+        _initialize_engine(app, vector_path, graph_path)
     )
     
+    # Shared scrape runner so HTTP connections are reused across requests
+    try:
+        from knowledge_server.scrapy_server.runner import AsyncScrapyRunner
+        app.state.scrape_runner = AsyncScrapyRunner(
+            max_concurrent=settings.scrape_concurrent
+        )
+    except ImportError:
+        app.state.scrape_runner = None
+    
     yield
     
-    # Cleanup on shutdown
-    if rag_engine:
-        rag_engine.vector_store.save()
-        rag_engine.graph_store.close()
+    # Cleanup on shutdown, after any in-flight initialization has finished
+    try:
+        await init_task
+    except Exception:
+        pass
+    if app.state.embedding_batcher:
+        await app.state.embedding_batcher.stop()
+    if app.state.scrape_runner:
+        await app.state.scrape_runner.aclose()
+    engine = app.state.rag_engine
+    if engine is not None:
+        if engine.async_reranker is not None:
+            await engine.async_reranker.stop()
+        # Write the index off the event loop; save() is a no-op when unchanged
+        await asyncio.to_thread(engine.save)
+        engine.graph_store.close()
 
 
 # Create FastAPI app
@@ -142,12 +270,19 @@ async def health_check() -> Dict[str, str]:
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check(request: Request) -> Dict[str, str]:
+    """Readiness endpoint; returns 503 until the RAG engine is loaded."""
+    get_rag_engine(request)
+    return {"status": "ready"}
+
+
 @app.post("/documents", response_model=Dict[str, str])
-async def add_document(request: DocumentRequest) -> Dict[str, str]:
+async def add_document(
+    request: DocumentRequest, engine: RAGEngine = Depends(get_rag_engine)
+) -> Dict[str, str]:
     """Add a document to the knowledge base."""
-    engine = get_rag_engine()
-    
-    engine.add_document(
+    await engine.add_document_async(
         doc_id=request.doc_id,
         title=request.title,
         content=request.content,
@@ -158,12 +293,27 @@ async def add_document(request: DocumentRequest) -> Dict[str, str]:
     return {"status": "success", "doc_id": request.doc_id}
 
 
+@app.post("/documents/batch", response_model=Dict[str, Any])
+async def add_documents(
+    request: DocumentBatchRequest, engine: RAGEngine = Depends(get_rag_engine)
+) -> Dict[str, Any]:
+    """Add several documents with one batched embedding pass."""
+    # Embedding a large batch takes a while, so keep it off the event loop;
+    # the engine lock keeps its store writes apart from other requests
+    await asyncio.to_thread(
+        engine.add_documents,
+        [doc.model_dump() for doc in request.documents],
+    )
+    
+    return {"status": "success", "count": len(request.documents)}
+
+
 @app.get("/documents/{doc_id}")
-async def get_document(doc_id: str) -> Dict[str, Any]:
+async def get_document(
+    doc_id: str, engine: RAGEngine = Depends(get_rag_engine)
+) -> Dict[str, Any]:
     """Get a document by ID."""
-    engine = get_rag_engine()
-    
-    doc = engine.graph_store.get_document(doc_id)
+    doc = await _locked(engine, engine.graph_store.get_document, doc_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
@@ -171,11 +321,13 @@ async def get_document(doc_id: str) -> Dict[str, Any]:
 
 
 @app.post("/entities", response_model=Dict[str, str])
-async def add_entity(request: EntityRequest) -> Dict[str, str]:
+async def add_entity(
+    request: EntityRequest, engine: RAGEngine = Depends(get_rag_engine)
+) -> Dict[str, str]:
     """Add an entity to the knowledge graph."""
-    engine = get_rag_engine()
-    
-    engine.graph_store.add_entity(
+    await _locked(
+        engine,
+        engine.graph_store.add_entity,
         entity_id=request.entity_id,
         name=request.name,
         entity_type=request.entity_type,
@@ -186,11 +338,11 @@ async def add_entity(request: EntityRequest) -> Dict[str, str]:
 
 
 @app.get("/entities/{entity_id}")
-async def get_entity(entity_id: str) -> Dict[str, Any]:
+async def get_entity(
+    entity_id: str, engine: RAGEngine = Depends(get_rag_engine)
+) -> Dict[str, Any]:
     """Get an entity by ID."""
-    engine = get_rag_engine()
-    
-    entity = engine.graph_store.get_entity(entity_id)
+    entity = await _locked(engine, engine.graph_store.get_entity, entity_id)
     if not entity:
         raise HTTPException(status_code=404, detail="Entity not found")
     
@@ -198,11 +350,13 @@ async def get_entity(entity_id: str) -> Dict[str, Any]:
 
 
 @app.post("/entities/link", response_model=Dict[str, str])
-async def link_entities(request: EntityLinkRequest) -> Dict[str, str]:
+async def link_entities(
+    request: EntityLinkRequest, engine: RAGEngine = Depends(get_rag_engine)
+) -> Dict[str, str]:
     """Link two entities with a relationship."""
-    engine = get_rag_engine()
-    
-    engine.graph_store.link_entities(
+    await _locked(
+        engine,
+        engine.graph_store.link_entities,
         source_id=request.source_id,
         target_id=request.target_id,
         relation_type=request.relation_type,
@@ -213,29 +367,44 @@ async def link_entities(request: EntityLinkRequest) -> Dict[str, str]:
 
 @app.get("/entities/{entity_id}/related")
 async def get_related_entities(
-    entity_id: str, relation_type: Optional[str] = None
+    entity_id: str,
+    relation_type: Optional[str] = None,
+    engine: RAGEngine = Depends(get_rag_engine),
 ) -> List[Dict[str, Any]]:
     """Get entities related to a given entity."""
-    engine = get_rag_engine()
-    
-    return engine.graph_store.get_related_entities(entity_id, relation_type)
+    return await _locked(
+        engine, engine.graph_store.get_related_entities, entity_id, relation_type
+    )
 
 
 @app.post("/search", response_model=SearchResponse)
-async def search(request: SearchRequest) -> SearchResponse:
+async def search(
+    request: SearchRequest,
+    http_request: Request,
+    engine: RAGEngine = Depends(get_rag_engine),
+) -> SearchResponse:
     """Search the knowledge base."""
-    engine = get_rag_engine()
+    # Embed through the shared batcher so concurrent queries share one
+    # forward pass
+    query_embedding = None
+    batcher = getattr(http_request.app.state, "embedding_batcher", None)
+    if batcher is not None and batcher.running:
+        query_embedding = await batcher.submit(request.query)
     
     if request.entity_name:
-        combined = engine.retrieve_with_graph(
+        # Takes the engine lock, so keep it off the event loop
+        combined = await asyncio.to_thread(
+            engine.retrieve_with_graph,
             query=request.query,
             entity_name=request.entity_name,
             top_k=request.top_k,
+            query_embedding=query_embedding,
         )
         
         results = [
             RetrievalResult(
                 id=r["id"],
+                doc_id=r.get("doc_id"),
                 score=r["score"],
                 content=r.get("content"),
             )
@@ -247,69 +416,128 @@ async def search(request: SearchRequest) -> SearchResponse:
             graph_results=combined["graph_results"],
         )
     else:
-        vector_results = engine.retrieve(
+        vector_results = await engine.aretrieve(
             query=request.query,
             top_k=request.top_k,
             include_graph_context=request.include_graph,
             use_reranker=request.use_reranker,
+            query_embedding=query_embedding,
         )
         
-        results = [
-            RetrievalResult(
-                id=r["id"],
-                score=r["score"],
-                content=r.get("content"),
-                entities=r.get("entities"),
-                original_score=r.get("original_score"),
-                reranked=r.get("reranked"),
-            )
-            for r in vector_results
-        ]
+        results = [_retrieval_result(r) for r in vector_results]
         
         return SearchResponse(results=results)
 
 
+@app.post("/search/batch", response_model=SearchBatchResponse)
+async def search_batch(
+    request: SearchBatchRequest, engine: RAGEngine = Depends(get_rag_engine)
+) -> SearchBatchResponse:
+    """Run several searches with one embedding pass and one index call."""
+    # The index and graph lookups take the engine lock inside retrieve_batch
+    batch_results = await asyncio.to_thread(
+        engine.retrieve_batch,
+        request.queries,
+        top_k=request.top_k,
+        include_graph_context=request.include_graph,
+        use_reranker=request.use_reranker,
+    )
+    
+    return SearchBatchResponse(
+        results=[[_retrieval_result(r) for r in results] for results in batch_results]
+    )
+
+
 @app.post("/context")
 async def get_context(
-    query: str, top_k: int = 3, max_tokens: int = 2000
+    query: str,
+    top_k: int = 3,
+    max_tokens: int = 2000,
+    engine: RAGEngine = Depends(get_rag_engine),
 ) -> Dict[str, str]:
     """Get context for a query (for use in generation)."""
-    engine = get_rag_engine()
-    
-    context = engine.get_context(query, top_k, max_tokens)
+    # Takes the engine lock, so keep it off the event loop
+    context = await asyncio.to_thread(engine.get_context, query, top_k, max_tokens)
     
     return {"context": context}
 
 
+def scraped_doc_id(url: str) -> str:
+    """Derive a document ID from a URL that is stable across processes."""
+    return f"scraped_{hashlib.blake2b(url.encode('utf-8'), digest_size=8).hexdigest()}"
+
+
+def _is_stored_unchanged(engine: RAGEngine, doc_id: str, title: str, content: str) -> bool:
+    """Check whether a document is already stored with the same title and content."""
+    # A graph row without its vector is an incomplete insert to be redone
+    with engine.lock:
+        existing = engine.graph_store.get_document(doc_id)
+        searchable = existing is not None and engine.has_vector(doc_id)
+    return (
+        searchable
+        and existing["d.title"] == title
+        and existing["d.content"] == content
+    )
+
+
+def _ingest_scraped(
+    engine: RAGEngine, pending: List[Tuple[Dict[str, Any], Dict[str, Any]]]
+) -> None:
+    """
+    Add scraped pages to the knowledge base; runs in a worker thread.
+    
+    Args:
+        engine: RAG engine to add the pages to.
+        pending: Pairs of scrape result and document to add. A failure is
+            recorded as 'ingest_error' on the scrape results it affects.
+    """
+    try:
+        # Pages re-scraped with unchanged content are already stored
+        pending = [
+            (page, doc) for page, doc in pending
+            if not _is_stored_unchanged(engine, doc["doc_id"], doc["title"], doc["content"])
+        ]
+        # Embed and store the new or changed pages in a single batch
+        if pending:
+            engine.add_documents([doc for _, doc in pending], batch_size=32)
+    except Exception as e:
+        for page, _ in pending:
+            page["ingest_error"] = str(e)
+
+
 @app.post("/scrape")
-async def scrape_urls(request: ScrapeRequest) -> Dict[str, Any]:
+async def scrape_urls(
+    request: ScrapeRequest, http_request: Request
+) -> Dict[str, Any]:
     """Scrape URLs and optionally add to knowledge base."""
-    try:
-        from knowledge_server.scrapy_server.runner import AsyncScrapyRunner
-    except ImportError:
+    runner = getattr(http_request.app.state, "scrape_runner", None)
+    if runner is None:
         raise HTTPException(
             status_code=500, detail="Scraping dependencies not installed"
         )
     
-    runner = AsyncScrapyRunner()
-    results = []
+    scraped_pages = await runner.scrape_urls(request.urls, return_exceptions=True)
     
-    for url in request.urls:
-        try:
-            scraped = await runner.scrape_url(url)
-            results.append(scraped)
-            
-            if request.add_to_knowledge_base:
-                engine = get_rag_engine()
-                doc_id = f"scraped_{hash(url) % (10**9)}"
-                engine.add_document(
-                    doc_id=doc_id,
-                    title=scraped["title"],
-                    content=scraped["content"],
-                    url=url,
-                )
-        except Exception as e:
-            results.append({"url": url, "error": str(e)})
+    results = []
+    pending = []
+    for url, scraped in zip(request.urls, scraped_pages):
+        if isinstance(scraped, Exception):
+            results.append({"url": url, "error": str(scraped)})
+            continue
+        
+        results.append(scraped)
+        pending.append((scraped, {
+            "doc_id": scraped_doc_id(url),
+            "title": scraped["title"],
+            "content": scraped["content"],
+            "url": url,
+        }))
+    
+    if request.add_to_knowledge_base and pending:
+        engine = get_rag_engine(http_request)
+        # Graph lookups and embedding are blocking, so keep them off the
+        # event loop
+        await asyncio.to_thread(_ingest_scraped, engine, pending)
     
     return {"scraped": results}
 
@@ -321,12 +549,12 @@ def run_server(host: str = "0.0.0.0", port: int = 8000) -> None:
 
 
 @app.get("/rerankers")
-async def list_rerankers() -> Dict[str, Any]:
+async def list_rerankers(
+    engine: RAGEngine = Depends(get_rag_engine),
+) -> Dict[str, Any]:
     """List available reranker models and current configuration."""
     from knowledge_server.rag.reranker import Reranker, RERANKER_MODELS
     
-    engine = get_rag_engine()
-    
     current_model = None
     if engine.reranker:
         current_model = engine.reranker.get_model_info()
@@ -0,0 +1,6 @@
+"""
+CLI command implementations.
+
+Each module exposes `add_arguments(parser)` and `run(args)` and is only
+imported when its command is selected.
+"""
@@ -0,0 +1,32 @@
+"""
+The `add` command: add a single document to the knowledge base.
+"""
+
+import argparse
+
+from knowledge_server.commands.common import create_engine
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add arguments for the add command."""
+    parser.add_argument("--id", required=True, help="Document ID")
+    parser.add_argument("--title", required=True, help="Document title")
+    parser.add_argument("--content", required=True, help="Document content")
+    parser.add_argument("--url", help="Source URL")
+
+
+def run(args: argparse.Namespace) -> int:
+    """Add a document to the knowledge base."""
+    engine = create_engine()
+
+    engine.add_document(
+        doc_id=args.id,
+        title=args.title,
+        content=args.content,
+        url=args.url,
+    )
+
+    engine.save()
+    print(f"Added document: {args.id}")
+
+    return 0
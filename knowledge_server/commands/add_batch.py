@@ -0,0 +1,34 @@
+"""
+The `add-batch` command: add documents from a JSONL file.
+"""
+
+import argparse
+import json
+
+from knowledge_server.commands.common import create_engine
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add arguments for the add-batch command."""
+    parser.add_argument(
+        "--input", "-i", required=True,
+        help="JSONL file with one document per line "
+             "('doc_id', 'title', 'content', optional 'url' and 'entities')",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=64, help="Embedding batch size"
+    )
+
+
+def run(args: argparse.Namespace) -> int:
+    """Add all documents from a JSONL file using a single engine."""
+    with open(args.input, encoding="utf-8") as f:
+        documents = [json.loads(line) for line in f if line.strip()]
+
+    engine = create_engine()
+    engine.add_documents(documents, batch_size=args.batch_size)
+
+    engine.save()
+    print(f"Added {len(documents)} documents from {args.input}")
+
+    return 0
@@ -0,0 +1,47 @@
+"""
+Helpers shared by the CLI commands.
+"""
+
+from typing import Any, Dict, List
+
+
+def create_engine():
+    """Create the stores and RAG engine from settings."""
+    from knowledge_server.config import get_settings
+    from knowledge_server.vector_db.vector_store import VectorStore
+    from knowledge_server.graph_db.graph_store import GraphStore
+    from knowledge_server.rag.model_cache import get_embedder
+    from knowledge_server.rag.rag_engine import RAGEngine
+
+    settings = get_settings()
+    settings.ensure_directories()
+
+    vector_store = VectorStore(
+        dimension=settings.vector_dimension,
+        db_path=settings.get_vector_db_path(),
+        dtype=settings.vector_dtype,
+        exact_search_max=settings.vector_exact_search_max,
+    )
+    graph_store = GraphStore(settings.get_graph_db_path())
+    return RAGEngine(
+        vector_store,
+        graph_store,
+        settings.embedding_model,
+        embedder=get_embedder(
+            settings.embedding_model,
+            settings.embedding_backend,
+            settings.embedding_onnx_file,
+        ),
+    )
+
+
+def print_search_results(query: str, results: List[Dict[str, Any]]) -> None:
+    """Print search results for a query."""
+    print(f"Search results for: {query}")
+    print("=" * 50)
+
+    for i, result in enumerate(results, 1):
+        print(f"{i}. Score: {result['score']:.4f}")
+        if result.get("content"):
+            print(f"   Content: {result['content'][:200]}...")
+        print()
@@ -0,0 +1,38 @@
+"""
+The `scrape` command: scrape URLs and print or save the results.
+"""
+
+import argparse
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add arguments for the scrape command."""
+    parser.add_argument(
+        "urls", nargs="+", help="URLs to scrape"
+    )
+    parser.add_argument(
+        "--output", "-o", help="Output file path"
+    )
+    parser.add_argument(
+        "--follow-links", action="store_true", help="Follow links on pages"
+    )
+
+
+def run(args: argparse.Namespace) -> int:
+    """Scrape URLs and print or save the results."""
+    from knowledge_server.scrapy_server.runner import ScrapyRunner, write_json
+
+    runner = ScrapyRunner()
+    results = runner.scrape_urls(args.urls, follow_links=args.follow_links)
+
+    if args.output:
+        write_json(results, args.output)
+        print(f"Saved {len(results)} results to {args.output}")
+    else:
+        for result in results:
+            print(f"URL: {result.get('url')}")
+            print(f"Title: {result.get('title')}")
+            print(f"Content: {result.get('content', '')[:200]}...")
+            print("-" * 50)
+
+    return 0
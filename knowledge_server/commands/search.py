@@ -0,0 +1,25 @@
+"""
+The `search` command: search the knowledge base.
+"""
+
+import argparse
+
+from knowledge_server.commands.common import create_engine, print_search_results
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add arguments for the search command."""
+    parser.add_argument("query", help="Search query")
+    parser.add_argument(
+        "--top-k", type=int, default=5, help="Number of results"
+    )
+
+
+def run(args: argparse.Namespace) -> int:
+    """Search the knowledge base."""
+    engine = create_engine()
+
+    results = engine.retrieve(args.query, args.top_k)
+    print_search_results(args.query, results)
+
+    return 0
@@ -0,0 +1,29 @@
+"""
+The `search-batch` command: run one search per line of a queries file.
+"""
+
+import argparse
+
+from knowledge_server.commands.common import create_engine, print_search_results
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add arguments for the search-batch command."""
+    parser.add_argument(
+        "--queries", "-q", required=True, help="Text file with one query per line"
+    )
+    parser.add_argument(
+        "--top-k", type=int, default=5, help="Number of results per query"
+    )
+
+
+def run(args: argparse.Namespace) -> int:
+    """Run every query from a file against a single engine."""
+    with open(args.queries, encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+
+    engine = create_engine()
+    for query, results in zip(queries, engine.retrieve_batch(queries, args.top_k)):
+        print_search_results(query, results)
+
+    return 0
@@ -0,0 +1,29 @@
+"""
+The `serve` command: run the API server.
+"""
+
+import argparse
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add arguments for the serve command."""
+    parser.add_argument(
+        "--host", default=None, help="Server host (default: from settings)"
+    )
+    parser.add_argument(
+        "--port", type=int, default=None, help="Server port (default: from settings)"
+    )
+
+
+def run(args: argparse.Namespace) -> int:
+    """Run the API server."""
+    from knowledge_server.config import get_settings
+    from knowledge_server.api.server import run_server
+
+    settings = get_settings()
+    settings.ensure_directories()
+    run_server(
+        host=args.host if args.host is not None else settings.host,
+        port=args.port if args.port is not None else settings.port,
+    )
+    return 0
@@ -3,7 +3,7 @@ Configuration settings for the Knowledge Server.
 """
 
 import os
-from pathlib import Path
+from functools import lru_cache
 from typing import Optional
 
 from pydantic import Field
@@ -21,12 +21,28 @@ class Settings(BaseSettings):
     # Vector store settings
     vector_dimension: int = Field(default=384, description="Vector embedding dimension")
     vector_metric: str = Field(default="cos", description="Distance metric (cos, l2, ip)")
+    vector_dtype: str = Field(
+        default="f32",
+        description="Element type stored in the vector index (f32, f16, i8)"
+    )
+    vector_exact_search_max: int = Field(
+        default=10_000,
+        description="Search exhaustively while the index holds at most this many vectors"
+    )
     
     # Embedding model
     embedding_model: str = Field(
         default="all-MiniLM-L6-v2",
         description="Sentence transformer model name"
     )
+    embedding_backend: str = Field(
+        default="torch",
+        description="Embedding inference backend (torch, onnx)"
+    )
+    embedding_onnx_file: str = Field(
+        default="onnx/model_qint8_avx512_vnni.onnx",
+        description="ONNX model file used by the onnx embedding backend"
+    )
     
     # Reranker settings
     use_reranker: bool = Field(
@@ -37,6 +53,13 @@ class Settings(BaseSettings):
         default="ms-marco-MiniLM-L-6-v2",
         description="Reranker model name (see docs for available models)"
     )
+    reranker_prune_ratio: Optional[float] = Field(
+        default=None,
+        description=(
+            "Skip reranking results scoring below this fraction of the best "
+            "retrieval score (disabled if unset)"
+        )
+    )
     
     # Server settings
     host: str = Field(default="0.0.0.0", description="Server host")
@@ -64,10 +87,27 @@ class Settings(BaseSettings):
     
     def ensure_directories(self) -> None:
         """Ensure all required directories exist."""
-        Path(self.data_dir).mkdir(parents=True, exist_ok=True)
-        Path(self.get_vector_db_path()).parent.mkdir(parents=True, exist_ok=True)
-        Path(self.get_graph_db_path()).mkdir(parents=True, exist_ok=True)
+        # Both stores create their own files; only their parents are needed,
+        # and those usually coincide with data_dir
+        directories = {
+            os.path.normpath(path)
+            for path in (
+                self.data_dir,
+                os.path.dirname(self.get_vector_db_path()),
+                os.path.dirname(self.get_graph_db_path()),
+            )
+            if path
+        }
+        for directory in directories:
+            os.makedirs(directory, exist_ok=True)
 
 
-# Global settings instance
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Get the application settings.
+    
+    Settings are loaded from the environment and `.env` on first call and
+    cached afterwards, so importing this module stays cheap.
+    """
+    return Settings()
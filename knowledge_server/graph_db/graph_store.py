@@ -2,12 +2,89 @@
 Graph Database Client using Kùzu DB for knowledge graph storage.
 """
 
+import importlib.util
 import os
+import warnings
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import kuzu
 
+# Bump when the schema changes so existing databases are initialized again
+SCHEMA_VERSION = 1
+
+# pyarrow is optional; when installed, large results are converted in bulk
+_HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# Results smaller than this are cheaper to convert row by row
+_BULK_CONVERSION_MIN_ROWS = 32
+
+# Entries kept per lookup cache (documents, entities, related entities)
+LOOKUP_CACHE_SIZE = 4096
+
+# Statements prepared once per connection and reused for every call
+_STATEMENTS = {
+    "upsert_document": """
+        MERGE (d:Document {id: $id})
+        ON CREATE SET d.title = $title, d.content = $content, d.url = $url
+        ON MATCH SET d.title = $title, d.content = $content, d.url = $url
+    """,
+    "upsert_entity": """
+        MERGE (e:Entity {id: $id})
+        ON CREATE SET e.name = $name, e.entity_type = $entity_type, e.description = $description
+        ON MATCH SET e.name = $name, e.entity_type = $entity_type, e.description = $description
+    """,
+    "merge_mention": """
+        MATCH (d:Document {id: $doc_id}), (e:Entity {id: $entity_id})
+        MERGE (d)-[:MENTIONS]->(e)
+    """,
+    "merge_relation": """
+        MATCH (s:Entity {id: $source_id}), (t:Entity {id: $target_id})
+        MERGE (s)-[:RELATED_TO {relation_type: $relation_type}]->(t)
+    """,
+    "bulk_upsert_documents": """
+        UNWIND $rows AS r
+        MERGE (d:Document {id: r.id})
+        SET d.title = r.title, d.content = r.content, d.url = r.url
+    """,
+    "bulk_upsert_entities": """
+        UNWIND $rows AS r
+        MERGE (e:Entity {id: r.id})
+        SET e.name = r.name, e.entity_type = r.entity_type, e.description = r.description
+    """,
+    "bulk_merge_mentions": """
+        UNWIND $rows AS r
+        MATCH (d:Document {id: r.doc_id}), (e:Entity {id: r.entity_id})
+        MERGE (d)-[:MENTIONS]->(e)
+    """,
+    "get_document": "MATCH (d:Document {id: $id}) RETURN d.id, d.title, d.content, d.url",
+    "get_entity": "MATCH (e:Entity {id: $id}) RETURN e.id, e.name, e.entity_type, e.description",
+    "get_document_entities": """
+        MATCH (d:Document {id: $id})-[:MENTIONS]->(e:Entity)
+        RETURN e.id, e.name, e.entity_type, e.description
+    """,
+    "get_related_entities": """
+        MATCH (s:Entity {id: $id})-[r:RELATED_TO]->(t:Entity)
+        RETURN t.id, t.name, t.entity_type, t.description, r.relation_type
+    """,
+    "get_related_entities_by_type": """
+        MATCH (s:Entity {id: $id})-[r:RELATED_TO]->(t:Entity)
+        WHERE r.relation_type = $rel_type
+        RETURN t.id, t.name, t.entity_type, t.description, r.relation_type
+    """,
+    "search_entities": """
+        MATCH (e:Entity)
+        WHERE contains(e.name, $pattern)
+        RETURN e.id, e.name, e.entity_type, e.description
+    """,
+    "search_entities_by_type": """
+        MATCH (e:Entity)
+        WHERE contains(e.name, $pattern) AND e.entity_type = $type
+        RETURN e.id, e.name, e.entity_type, e.description
+    """,
+}
+
 
 class GraphStore:
     """Graph store implementation using Kùzu DB."""
@@ -23,61 +100,81 @@ class GraphStore:
         # Kuzu requires the parent directory to exist but not the db path itself
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         
+        db_exists = os.path.exists(db_path)
         self.db = kuzu.Database(db_path)
         self.conn = kuzu.Connection(self.db)
         
-        self._initialize_schema()
+        # Skip the schema DDL when this database was already initialized
+        schema_marker = f"{db_path}.schema_v{SCHEMA_VERSION}"
+        if not (db_exists and os.path.exists(schema_marker)):
+            self._initialize_schema()
+            Path(schema_marker).touch()
+        self._stmts = self._prepare_statements()
+        
+        # Read-mostly lookups are cached per store and cleared on writes
+        self._document_cache = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._fetch_document)
+        self._entity_cache = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._fetch_entity)
+        self._related_cache = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._fetch_related_entities)
+    
+    def clear_cache(self) -> None:
+        """Drop all cached lookup results."""
+        self._document_cache.cache_clear()
+        self._entity_cache.cache_clear()
+        self._related_cache.cache_clear()
+    
+    def _prepare_statements(self) -> Dict[str, Any]:
+        """Parse and plan all statements once so calls skip that work."""
+        # Newer Kùzu releases mark prepare() deprecated but still support it
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            return {
+                name: self.conn.prepare(query)
+                for name, query in _STATEMENTS.items()
+            }
     
     def _initialize_schema(self) -> None:
         """Initialize the knowledge graph schema."""
         # Create Document node table
-        try:
-            self.conn.execute("""
-                CREATE NODE TABLE Document(
-                    id STRING PRIMARY KEY,
-                    title STRING,
-                    content STRING,
-                    url STRING
-                )
-            """)
-        except Exception:
-            pass
+        self.conn.execute("""
+            CREATE NODE TABLE IF NOT EXISTS Document(
+                id STRING PRIMARY KEY,
+                title STRING,
+                content STRING,
+                url STRING
+            )
+        """)
         
         # Create Entity node table
-        try:
-            self.conn.execute("""
-                CREATE NODE TABLE Entity(
-                    id STRING PRIMARY KEY,
-                    name STRING,
-                    entity_type STRING,
-                    description STRING
-                )
-            """)
-        except Exception:
-            pass
+        self.conn.execute("""
+            CREATE NODE TABLE IF NOT EXISTS Entity(
+                id STRING PRIMARY KEY,
+                name STRING,
+                entity_type STRING,
+                description STRING
+            )
+        """)
         
         # Create relationships
-        try:
-            self.conn.execute("""
-                CREATE REL TABLE MENTIONS(
-                    FROM Document TO Entity
-                )
-            """)
-        except Exception:
-            pass
+        self.conn.execute("""
+            CREATE REL TABLE IF NOT EXISTS MENTIONS(
+                FROM Document TO Entity
+            )
+        """)
         
-        try:
-            self.conn.execute("""
-                CREATE REL TABLE RELATED_TO(
-                    FROM Entity TO Entity,
-                    relation_type STRING
-                )
-            """)
-        except Exception:
-            pass
+        self.conn.execute("""
+            CREATE REL TABLE IF NOT EXISTS RELATED_TO(
+                FROM Entity TO Entity,
+                relation_type STRING
+            )
+        """)
     
     def _result_to_dict(self, result: kuzu.QueryResult) -> List[Dict[str, Any]]:
         """Convert Kuzu query result to list of dictionaries."""
+        # Fetch large results as one Arrow table instead of crossing into
+        # Kùzu once per row
+        if _HAS_PYARROW and result.get_num_tuples() >= _BULK_CONVERSION_MIN_ROWS:
+            return result.get_as_arrow(chunk_size=10_000).to_pylist()
+        
         columns = result.get_column_names()
         rows = []
         while result.has_next():
@@ -101,29 +198,11 @@ class GraphStore:
             content: Document content.
             url: Optional source URL.
         """
-        # Check if document exists
-        result = self.conn.execute(
-            "MATCH (d:Document {id: $id}) RETURN d.id",
-            {"id": doc_id}
+        self.conn.execute(
+            self._stmts["upsert_document"],
+            {"id": doc_id, "title": title, "content": content, "url": url or ""},
         )
-        
-        if result.has_next():
-            # Update existing document
-            self.conn.execute(
-                """
-                MATCH (d:Document {id: $id})
-                SET d.title = $title, d.content = $content, d.url = $url
-                """,
-                {"id": doc_id, "title": title, "content": content, "url": url or ""},
-            )
-        else:
-            # Create new document
-            self.conn.execute(
-                """
-                CREATE (:Document {id: $id, title: $title, content: $content, url: $url})
-                """,
-                {"id": doc_id, "title": title, "content": content, "url": url or ""},
-            )
+        self._document_cache.cache_clear()
     
     def add_entity(
         self,
@@ -141,29 +220,13 @@ class GraphStore:
             entity_type: Type of entity (e.g., 'Person', 'Organization').
             description: Optional entity description.
         """
-        # Check if entity exists
-        result = self.conn.execute(
-            "MATCH (e:Entity {id: $id}) RETURN e.id",
-            {"id": entity_id}
+        self.conn.execute(
+            self._stmts["upsert_entity"],
+            {"id": entity_id, "name": name, "entity_type": entity_type, "description": description or ""},
         )
-        
-        if result.has_next():
-            # Update existing entity
-            self.conn.execute(
-                """
-                MATCH (e:Entity {id: $id})
-                SET e.name = $name, e.entity_type = $entity_type, e.description = $description
-                """,
-                {"id": entity_id, "name": name, "entity_type": entity_type, "description": description or ""},
-            )
-        else:
-            # Create new entity
-            self.conn.execute(
-                """
-                CREATE (:Entity {id: $id, name: $name, entity_type: $entity_type, description: $description})
-                """,
-                {"id": entity_id, "name": name, "entity_type": entity_type, "description": description or ""},
-            )
+        # Related-entity results embed the target entity's fields
+        self._entity_cache.cache_clear()
+        self._related_cache.cache_clear()
     
     def link_document_entity(self, doc_id: str, entity_id: str) -> None:
         """
@@ -173,23 +236,10 @@ class GraphStore:
             doc_id: Document ID.
             entity_id: Entity ID.
         """
-        # Check if relationship already exists
-        result = self.conn.execute(
-            """
-            MATCH (d:Document {id: $doc_id})-[r:MENTIONS]->(e:Entity {id: $entity_id})
-            RETURN r
-            """,
-            {"doc_id": doc_id, "entity_id": entity_id}
+        self.conn.execute(
+            self._stmts["merge_mention"],
+            {"doc_id": doc_id, "entity_id": entity_id},
         )
-        
-        if not result.has_next():
-            self.conn.execute(
-                """
-                MATCH (d:Document {id: $doc_id}), (e:Entity {id: $entity_id})
-                CREATE (d)-[:MENTIONS]->(e)
-                """,
-                {"doc_id": doc_id, "entity_id": entity_id},
-            )
     
     def link_entities(
         self,
@@ -205,23 +255,74 @@ class GraphStore:
             target_id: Target entity ID.
             relation_type: Type of relationship.
         """
-        # Check if relationship already exists
-        result = self.conn.execute(
-            """
-            MATCH (s:Entity {id: $source_id})-[r:RELATED_TO]->(t:Entity {id: $target_id})
-            RETURN r
-            """,
-            {"source_id": source_id, "target_id": target_id}
+        self.conn.execute(
+            self._stmts["merge_relation"],
+            {"source_id": source_id, "target_id": target_id, "relation_type": relation_type},
         )
+        self._related_cache.cache_clear()
+    
+    def bulk_add_documents(self, documents: List[Dict[str, Any]]) -> None:
+        """
+        Add or update many documents with a single statement.
         
-        if not result.has_next():
-            self.conn.execute(
-                """
-                MATCH (s:Entity {id: $source_id}), (t:Entity {id: $target_id})
-                CREATE (s)-[:RELATED_TO {relation_type: $relation_type}]->(t)
-                """,
-                {"source_id": source_id, "target_id": target_id, "relation_type": relation_type},
-            )
+        Args:
+            documents: List of documents with 'id', 'title', 'content'
+                and optional 'url' keys.
+        """
+        if not documents:
+            return
+        
+        rows = [
+            {
+                "id": doc["id"],
+                "title": doc["title"],
+                "content": doc["content"],
+                "url": doc.get("url") or "",
+            }
+            for doc in documents
+        ]
+        self.conn.execute(self._stmts["bulk_upsert_documents"], {"rows": rows})
+        self._document_cache.cache_clear()
+    
+    def bulk_add_entities(self, entities: List[Dict[str, Any]]) -> None:
+        """
+        Add or update many entities with a single statement.
+        
+        Args:
+            entities: List of entities with 'id', 'name', 'entity_type'
+                and optional 'description' keys.
+        """
+        if not entities:
+            return
+        
+        rows = [
+            {
+                "id": entity["id"],
+                "name": entity["name"],
+                "entity_type": entity["entity_type"],
+                "description": entity.get("description") or "",
+            }
+            for entity in entities
+        ]
+        self.conn.execute(self._stmts["bulk_upsert_entities"], {"rows": rows})
+        self._entity_cache.cache_clear()
+        self._related_cache.cache_clear()
+    
+    def bulk_link_mentions(self, links: List[Tuple[str, str]]) -> None:
+        """
+        Create many MENTIONS relationships with a single statement.
+        
+        Args:
+            links: List of (doc_id, entity_id) pairs.
+        """
+        if not links:
+            return
+        
+        rows = [
+            {"doc_id": doc_id, "entity_id": entity_id}
+            for doc_id, entity_id in links
+        ]
+        self.conn.execute(self._stmts["bulk_merge_mentions"], {"rows": rows})
     
     def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -233,10 +334,13 @@ class GraphStore:
         Returns:
             Document data or None if not found.
         """
-        result = self.conn.execute(
-            "MATCH (d:Document {id: $id}) RETURN d.id, d.title, d.content, d.url",
-            {"id": doc_id},
-        )
+        document = self._document_cache(doc_id)
+        # Copy so callers can modify the result without touching the cache
+        return dict(document) if document else None
+    
+    def _fetch_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Query a document by ID, bypassing the cache."""
+        result = self.conn.execute(self._stmts["get_document"], {"id": doc_id})
         
         rows = self._result_to_dict(result)
         return rows[0] if rows else None
@@ -251,10 +355,12 @@ class GraphStore:
         Returns:
             Entity data or None if not found.
         """
-        result = self.conn.execute(
-            "MATCH (e:Entity {id: $id}) RETURN e.id, e.name, e.entity_type, e.description",
-            {"id": entity_id},
-        )
+        entity = self._entity_cache(entity_id)
+        return dict(entity) if entity else None
+    
+    def _fetch_entity(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        """Query an entity by ID, bypassing the cache."""
+        result = self.conn.execute(self._stmts["get_entity"], {"id": entity_id})
         
         rows = self._result_to_dict(result)
         return rows[0] if rows else None
@@ -270,11 +376,7 @@ class GraphStore:
             List of entity data.
         """
         result = self.conn.execute(
-            """
-            MATCH (d:Document {id: $id})-[:MENTIONS]->(e:Entity)
-            RETURN e.id, e.name, e.entity_type, e.description
-            """,
-            {"id": doc_id},
+            self._stmts["get_document_entities"], {"id": doc_id}
         )
         
         return self._result_to_dict(result)
@@ -294,22 +396,22 @@ class GraphStore:
         Returns:
             List of related entities with relation info.
         """
+        return [dict(row) for row in self._related_cache(entity_id, relation_type)]
+    
+    def _fetch_related_entities(
+        self,
+        entity_id: str,
+        relation_type: Optional[str],
+    ) -> List[Dict[str, Any]]:
+        """Query related entities, bypassing the cache."""
         if relation_type:
             result = self.conn.execute(
-                """
-                MATCH (s:Entity {id: $id})-[r:RELATED_TO]->(t:Entity)
-                WHERE r.relation_type = $rel_type
-                RETURN t.id, t.name, t.entity_type, t.description, r.relation_type
-                """,
+                self._stmts["get_related_entities_by_type"],
                 {"id": entity_id, "rel_type": relation_type},
             )
         else:
             result = self.conn.execute(
-                """
-                MATCH (s:Entity {id: $id})-[r:RELATED_TO]->(t:Entity)
-                RETURN t.id, t.name, t.entity_type, t.description, r.relation_type
-                """,
-                {"id": entity_id},
+                self._stmts["get_related_entities"], {"id": entity_id}
             )
         
         return self._result_to_dict(result)
@@ -331,21 +433,12 @@ class GraphStore:
         """
         if entity_type:
             result = self.conn.execute(
-                """
-                MATCH (e:Entity)
-                WHERE contains(e.name, $pattern) AND e.entity_type = $type
-                RETURN e.id, e.name, e.entity_type, e.description
-                """,
+                self._stmts["search_entities_by_type"],
                 {"pattern": name_pattern, "type": entity_type},
             )
         else:
             result = self.conn.execute(
-                """
-                MATCH (e:Entity)
-                WHERE contains(e.name, $pattern)
-                RETURN e.id, e.name, e.entity_type, e.description
-                """,
-                {"pattern": name_pattern},
+                self._stmts["search_entities"], {"pattern": name_pattern}
             )
         
         return self._result_to_dict(result)
@@ -1,5 +1,5 @@
 """RAG Module for Retrieval-Augmented Generation"""
 
-from knowledge_server.rag.reranker import Reranker, RERANKER_MODELS, DEFAULT_RERANKER_MODEL
+from knowledge_server.rag.reranker import AsyncReranker, Reranker, RERANKER_MODELS, DEFAULT_RERANKER_MODEL
 
-__all__ = ["Reranker", "RERANKER_MODELS", "DEFAULT_RERANKER_MODEL"]
+__all__ = ["AsyncReranker", "Reranker", "RERANKER_MODELS", "DEFAULT_RERANKER_MODEL"]
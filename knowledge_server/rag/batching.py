@@ -0,0 +1,130 @@
+"""
+Dynamic micro-batching for model inference.
+Coalesces concurrent requests into a single batched call.
+"""
+
+import asyncio
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+class MicroBatcher:
+    """
+    Collect items submitted by concurrent coroutines and process them in batches.
+
+    A background task waits for the first queued item, then keeps collecting
+    until either `max_batch` items are queued or `max_wait` seconds have
+    passed. The batch function runs in a worker thread so the event loop
+    stays responsive, and each caller receives its own result.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch: int = 32,
+        max_wait: float = 0.02,
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            batch_fn: Function mapping a list of items to a same-length
+                sequence of results (e.g. RAGEngine.embed_queries).
+            max_batch: Maximum number of items per batch.
+            max_wait: Maximum time in seconds to wait for a batch to fill.
+        """
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the background batching task is running."""
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """Start the background batching task."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and fail any pending requests."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Submit an item and wait for its result.
+
+        Args:
+            item: Item to process.
+
+        Returns:
+            The result computed for this item.
+        """
+        if not self.running:
+            raise RuntimeError("Batcher is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        """Wait for the next batch of queued items."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        try:
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # These items are no longer queued, so stop() cannot fail them
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Batcher stopped"))
+            raise
+
+        return batch
+
+    async def _run(self) -> None:
+        """Background loop that processes batches until cancelled."""
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+
+            try:
+                results = await asyncio.to_thread(self.batch_fn, items)
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
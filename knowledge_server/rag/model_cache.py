@@ -0,0 +1,94 @@
+"""
+Process-wide cache of loaded embedding models.
+"""
+
+import warnings
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import torch
+from sentence_transformers import SentenceTransformer
+
+
+# Supported embedding inference backends
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+# Dynamically quantized INT8 export shipped with the sentence-transformers
+# hub models (e.g. all-MiniLM-L6-v2); other models are exported on first load
+DEFAULT_ONNX_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+
+def model_kwargs_for_device(device: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Return model loading options for the target device.
+
+    On CUDA GPUs with bfloat16 support the weights are loaded directly in
+    bfloat16, which halves memory traffic during inference. Other devices
+    keep the default float32 weights.
+
+    Args:
+        device: Target device ('cpu', 'cuda', ...). Auto-detected if None.
+
+    Returns:
+        Keyword arguments for the underlying transformers model.
+    """
+    if device is None:
+        on_cuda = torch.cuda.is_available()
+    else:
+        on_cuda = str(device).startswith("cuda")
+
+    if on_cuda and torch.cuda.is_bf16_supported():
+        return {"torch_dtype": torch.bfloat16}
+    return {}
+
+
+def _load_onnx_embedder(model_name: str, onnx_file: str) -> SentenceTransformer:
+    """Load a model on ONNX Runtime's CPU provider."""
+    return SentenceTransformer(
+        model_name,
+        backend="onnx",
+        model_kwargs={"file_name": onnx_file, "provider": "CPUExecutionProvider"},
+    )
+
+
+@lru_cache(maxsize=4)
+def get_embedder(
+    model_name: str,
+    backend: str = "torch",
+    onnx_file: str = DEFAULT_ONNX_FILE,
+) -> SentenceTransformer:
+    """
+    Load a sentence transformer model once per process.
+
+    The 'onnx' backend runs the model with ONNX Runtime (by default the INT8
+    quantized export), which is several times faster than float32 PyTorch on
+    CPU. If ONNX Runtime is not installed or the model cannot be exported,
+    the PyTorch backend is used instead.
+
+    Args:
+        model_name: Name or path of the sentence transformer model.
+        backend: Inference backend, one of EMBEDDING_BACKENDS.
+        onnx_file: ONNX file inside the model repository (onnx backend only).
+
+    Returns:
+        The shared model instance for these options.
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unknown embedding backend '{backend}' "
+            f"(choose from {', '.join(EMBEDDING_BACKENDS)})"
+        )
+
+    if backend == "onnx":
+        try:
+            return _load_onnx_embedder(model_name, onnx_file)
+        except Exception as e:
+            # sentence-transformers raises a bare Exception when optimum or
+            # onnxruntime is missing
+            warnings.warn(
+                f"Could not load '{model_name}' with ONNX Runtime ({e}); "
+                "falling back to PyTorch",
+                RuntimeWarning,
+            )
+
+    return SentenceTransformer(model_name, model_kwargs=model_kwargs_for_device())
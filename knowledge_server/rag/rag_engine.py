@@ -3,14 +3,85 @@ RAG (Retrieval-Augmented Generation) Engine.
 Combines vector search with graph-based knowledge retrieval.
 """
 
-from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import warnings
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
 from knowledge_server.vector_db.vector_store import VectorStore
 from knowledge_server.graph_db.graph_store import GraphStore
-from knowledge_server.rag.reranker import Reranker, DEFAULT_RERANKER_MODEL
+from knowledge_server.cache import LRUCache
+from knowledge_server.rag.model_cache import get_embedder
+from knowledge_server.rag.reranker import AsyncReranker, Reranker, DEFAULT_RERANKER_MODEL
+
+
+# tiktoken is optional; when installed, context budgets count real tokens
+_HAS_TIKTOKEN = importlib.util.find_spec("tiktoken") is not None
+
+# Encoding used to count context tokens, shared by current OpenAI models
+CONTEXT_ENCODING = "cl100k_base"
+
+# A truncated final document is only kept if at least this many tokens fit
+_MIN_TRUNCATED_TOKENS = 25
+
+
+@lru_cache(maxsize=1)
+def _context_encoding():
+    """Load the tiktoken encoding for context budgets, or None if unavailable."""
+    if not _HAS_TIKTOKEN:
+        return None
+    import tiktoken
+    try:
+        return tiktoken.get_encoding(CONTEXT_ENCODING)
+    except Exception as e:  # The encoding file is downloaded on first use
+        warnings.warn(
+            f"Could not load tiktoken encoding {CONTEXT_ENCODING!r} ({e}); "
+            "estimating context tokens from characters",
+            RuntimeWarning,
+        )
+        return None
+
+
+def _fit_tokens(contents: List[str], max_tokens: int, encoding) -> List[str]:
+    """Take contents in order until max_tokens, truncating the last one."""
+    parts = []
+    used = 0
+    for content, tokens in zip(contents, encoding.encode_ordinary_batch(contents)):
+        if used + len(tokens) <= max_tokens:
+            parts.append(content)
+            used += len(tokens)
+            continue
+        remaining = max_tokens - used
+        if remaining >= _MIN_TRUNCATED_TOKENS:
+            parts.append(encoding.decode(tokens[:remaining]))
+        break
+    return parts
+
+
+def _fit_chars(contents: List[str], max_tokens: int) -> List[str]:
+    """Take contents in order until roughly max_tokens, counting 4 chars a token."""
+    parts = []
+    total_chars = 0
+    char_limit = max_tokens * 4  # Rough approximation
+    for content in contents:
+        if total_chars + len(content) <= char_limit:
+            parts.append(content)
+            total_chars += len(content)
+            continue
+        # Truncate if needed
+        remaining = char_limit - total_chars
+        if remaining > _MIN_TRUNCATED_TOKENS * 4:
+            parts.append(content[:remaining])
+        break
+    return parts
 
 
 class RAGEngine:
@@ -23,6 +94,9 @@ class RAGEngine:
         embedding_model: str = "all-MiniLM-L6-v2",
         reranker_model: Optional[str] = None,
         use_reranker: bool = False,
+        embedder: Optional[SentenceTransformer] = None,
+        query_cache_size: int = 4096,
+        reranker_prune_ratio: Optional[float] = None,
     ):
         """
         Initialize the RAG engine.
@@ -33,17 +107,42 @@ class RAGEngine:
             embedding_model: Name of the sentence transformer model.
             reranker_model: Name of the reranker model (see Reranker.list_available_models()).
             use_reranker: Whether to use reranking by default.
+            embedder: Preloaded embedding model. Defaults to the process-wide
+                model for `embedding_model`.
+            query_cache_size: Number of query embeddings to keep for
+                repeated queries (0 disables the cache).
+            reranker_prune_ratio: Skip reranking results whose retrieval
+                score is below this fraction of the best one (see
+                Reranker). Disabled if None.
         """
         self.vector_store = vector_store
         self.graph_store = graph_store
-        self.embedding_model = SentenceTransformer(embedding_model)
+        self.embedding_model = embedder or get_embedder(embedding_model)
         self.use_reranker = use_reranker
         self.reranker: Optional[Reranker] = None
+        # Set by async hosts (the API server) to batch reranking across requests
+        self.async_reranker: Optional[AsyncReranker] = None
+        # The model is fixed per engine, so the query text alone is the key
+        self._query_cache = LRUCache(query_cache_size)
+        # Serializes access to the stores, which are not thread-safe. Taken
+        # for store reads and writes only, never while embedding or
+        # reranking, so hosts that call the engine from worker threads
+        # (the API server) must take it for direct store access as well.
+        self.lock = threading.RLock()
+        
+        # Vector keys are hashes, so keep the reverse mapping to document IDs
+        self._doc_ids: Dict[int, str] = {}
+        self._doc_ids_dirty = False
+        doc_ids_path = self._doc_ids_path()
+        if doc_ids_path and os.path.exists(doc_ids_path):
+            with open(doc_ids_path, encoding="utf-8") as f:
+                self._doc_ids = {int(key): doc_id for key, doc_id in json.load(f).items()}
         
         # Initialize reranker if requested
         if use_reranker or reranker_model:
             self.reranker = Reranker(
-                model_name=reranker_model or DEFAULT_RERANKER_MODEL
+                model_name=reranker_model or DEFAULT_RERANKER_MODEL,
+                prune_ratio=reranker_prune_ratio,
             )
     
     def embed_text(self, text: str) -> np.ndarray:
@@ -58,17 +157,122 @@ class RAGEngine:
         """
         return self.embedding_model.encode(text, convert_to_numpy=True)
     
-    def embed_texts(self, texts: List[str]) -> np.ndarray:
+    def embed_texts(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
         """
         Generate embeddings for multiple texts.
         
         Args:
             texts: List of input texts.
+            batch_size: Number of texts encoded per model forward pass.
             
         Returns:
             Array of embedding vectors.
         """
-        return self.embedding_model.encode(texts, convert_to_numpy=True)
+        # encode() already sorts inputs by length before batching and
+        # restores the original order, so padding per batch stays small
+        return self.embedding_model.encode(
+            texts, batch_size=batch_size, convert_to_numpy=True
+        )
+    
+    def embed_queries(self, queries: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Generate embeddings for search queries.
+        
+        Embeddings of recently seen queries are reused; only new queries
+        are encoded.
+        
+        Args:
+            queries: List of query texts.
+            batch_size: Number of texts encoded per model forward pass.
+            
+        Returns:
+            Array of embedding vectors, one row per query.
+        """
+        embeddings = [self._query_cache.get(query) for query in queries]
+        missing = list(dict.fromkeys(
+            query for query, embedding in zip(queries, embeddings) if embedding is None
+        ))
+        
+        if missing:
+            encoded = {}
+            for query, embedding in zip(missing, self.embed_texts(missing, batch_size)):
+                # Cached arrays are shared between callers, so freeze them
+                embedding.flags.writeable = False
+                self._query_cache.put(query, embedding)
+                encoded[query] = embedding
+            embeddings = [
+                embedding if embedding is not None else encoded[query]
+                for query, embedding in zip(queries, embeddings)
+            ]
+        
+        return np.stack(embeddings)
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Generate the embedding for a search query, using the query cache.
+        
+        Args:
+            query: Query text.
+            
+        Returns:
+            Embedding vector as numpy array.
+        """
+        return self.embed_queries([query])[0]
+    
+    @staticmethod
+    def _vector_id(doc_id: str) -> int:
+        """Map a document ID to its integer key in the vector store."""
+        # A keyed hash is stable across processes, unlike the builtin hash()
+        digest = hashlib.blake2b(doc_id.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") & ((1 << 63) - 1)
+    
+    def _register_doc_ids(self, doc_ids: List[str]) -> List[int]:
+        """Compute vector keys for documents and remember the reverse mapping."""
+        keys = [self._vector_id(doc_id) for doc_id in doc_ids]
+        self._doc_ids.update(zip(keys, doc_ids))
+        self._doc_ids_dirty = True
+        return keys
+    
+    def get_doc_id(self, vector_id: int) -> Optional[str]:
+        """
+        Get the document ID stored under a vector key.
+        
+        Args:
+            vector_id: Key returned in retrieval results.
+            
+        Returns:
+            The document ID, or None if unknown.
+        """
+        return self._doc_ids.get(vector_id)
+    
+    def has_vector(self, doc_id: str) -> bool:
+        """
+        Check whether a document's embedding is in the vector store.
+        
+        Args:
+            doc_id: Document ID.
+            
+        Returns:
+            True if the document can be found by vector search.
+        """
+        return self._vector_id(doc_id) in self.vector_store
+    
+    def _doc_ids_path(self) -> Optional[str]:
+        """Path of the vector key to document ID mapping, next to the index."""
+        if not self.vector_store.db_path:
+            return None
+        return f"{self.vector_store.db_path}.doc_ids.json"
+    
+    def save(self) -> None:
+        """Persist the vector index and the vector key mapping."""
+        with self.lock:
+            self.vector_store.save()
+            
+            doc_ids_path = self._doc_ids_path()
+            if doc_ids_path and self._doc_ids_dirty:
+                with open(doc_ids_path, "w", encoding="utf-8") as f:
+                    json.dump({str(key): doc_id for key, doc_id in self._doc_ids.items()}, f)
+                self._doc_ids_dirty = False
     
     def add_document(
         self,
@@ -88,50 +292,137 @@ class RAGEngine:
             url: Optional source URL.
             entities: Optional list of entities with 'id', 'name', 'type'.
         """
-        # Add to graph store
-        self.graph_store.add_document(doc_id, title, content, url)
-        
-        # Generate embedding and add to vector store
+        # Generate embedding before taking the lock
         embedding = self.embed_text(content)
-        int_id = hash(doc_id) % (10**9)
-        self.vector_store.add(
-            vectors=[embedding],
-            texts=[content],
-            ids=[int_id],
-        )
+        self._store_document(doc_id, title, content, url, entities, embedding)
+    
+    async def add_document_async(
+        self,
+        doc_id: str,
+        title: str,
+        content: str,
+        url: Optional[str] = None,
+        entities: Optional[List[Dict[str, str]]] = None,
+    ) -> None:
+        """
+        Async variant of add_document() for use inside an event loop.
+        
+        The embedding and the store writes run in worker threads, so
+        neither blocks the event loop. Nothing is written if embedding
+        fails.
         
-        # Add entities and link them to the document
-        if entities:
-            for entity in entities:
-                self.graph_store.add_entity(
-                    entity_id=entity["id"],
-                    name=entity["name"],
-                    entity_type=entity.get("type", "Unknown"),
-                    description=entity.get("description"),
+        Args:
+            doc_id: Unique document ID.
+            title: Document title.
+            content: Document content.
+            url: Optional source URL.
+            entities: Optional list of entities with 'id', 'name', 'type'.
+        """
+        embedding = await asyncio.to_thread(self.embed_text, content)
+        await asyncio.to_thread(
+            self._store_document, doc_id, title, content, url, entities, embedding
+        )
+    
+    def _store_document(
+        self,
+        doc_id: str,
+        title: str,
+        content: str,
+        url: Optional[str],
+        entities: Optional[List[Dict[str, str]]],
+        embedding: np.ndarray,
+    ) -> None:
+        """Write an embedded document to both stores under the engine lock."""
+        # Hold the lock across both stores so readers see the whole document
+        with self.lock:
+            self.graph_store.add_document(doc_id, title, content, url)
+            self.vector_store.add(
+                vectors=[embedding],
+                texts=[content],
+                ids=self._register_doc_ids([doc_id]),
+            )
+            
+            # Add entities and link them to the document
+            if entities:
+                self._add_entities(
+                    entities, [(doc_id, entity["id"]) for entity in entities]
                 )
-                self.graph_store.link_document_entity(doc_id, entity["id"])
     
-    def retrieve(
+    def add_documents(
         self,
-        query: str,
-        top_k: int = 5,
-        include_graph_context: bool = True,
-        use_reranker: Optional[bool] = None,
-        rerank_top_k: Optional[int] = None,
-    ) -> List[Dict[str, Any]]:
+        documents: List[Dict[str, Any]],
+        batch_size: int = 64,
+    ) -> None:
         """
-        Retrieve relevant documents for a query.
+        Add multiple documents to both vector and graph stores.
+        
+        All contents are embedded with a single batched encode call and
+        inserted into the vector store at once, which is much faster than
+        calling add_document() in a loop.
         
         Args:
-            query: Search query.
-            top_k: Number of results to return.
-            include_graph_context: Whether to include related entities.
-            use_reranker: Whether to use reranking. Defaults to self.use_reranker.
-            rerank_top_k: Number of candidates to fetch for reranking (default: top_k * 3).
-            
-        Returns:
-            List of retrieval results with content and metadata.
+            documents: List of documents with 'doc_id', 'title', 'content'
+                and optional 'url' and 'entities' keys.
+            batch_size: Number of texts encoded per model forward pass.
         """
+        if not documents:
+            return
+        
+        # A repeated ID keeps its last version; the vector index rejects
+        # duplicate keys within one insert
+        documents = list({doc["doc_id"]: doc for doc in documents}.values())
+        
+        contents = [doc["content"] for doc in documents]
+        embeddings = self.embed_texts(contents, batch_size=batch_size)
+        
+        entities = []
+        links = []
+        for doc in documents:
+            for entity in doc.get("entities") or []:
+                entities.append(entity)
+                links.append((doc["doc_id"], entity["id"]))
+        
+        with self.lock:
+            self.graph_store.bulk_add_documents([
+                {
+                    "id": doc["doc_id"],
+                    "title": doc["title"],
+                    "content": doc["content"],
+                    "url": doc.get("url"),
+                }
+                for doc in documents
+            ])
+            self.vector_store.add(
+                vectors=embeddings,
+                texts=contents,
+                ids=self._register_doc_ids([doc["doc_id"] for doc in documents]),
+            )
+            self._add_entities(entities, links)
+    
+    def _add_entities(
+        self,
+        entities: List[Dict[str, str]],
+        links: List[Tuple[str, str]],
+    ) -> None:
+        """Add entities to the graph and link them to their documents."""
+        self.graph_store.bulk_add_entities([
+            {
+                "id": entity["id"],
+                "name": entity["name"],
+                "entity_type": entity.get("type", "Unknown"),
+                "description": entity.get("description"),
+            }
+            for entity in entities
+        ])
+        self.graph_store.bulk_link_mentions(links)
+    
+    def _rerank_plan(
+        self,
+        top_k: int,
+        use_reranker: Optional[bool],
+        rerank_top_k: Optional[int],
+    ) -> Tuple[bool, int]:
+        """Decide whether to rerank and how many candidates to fetch."""
         # Determine if we should use reranking
         should_rerank = use_reranker if use_reranker is not None else self.use_reranker
         should_rerank = should_rerank and self.reranker is not None
@@ -141,36 +432,181 @@ class RAGEngine:
         if should_rerank:
             fetch_k = rerank_top_k or (top_k * 3)
         
+        return should_rerank, fetch_k
+    
+    def _vector_candidates(
+        self,
+        query: str,
+        fetch_k: int,
+        include_graph_context: bool,
+        query_embedding: Optional[np.ndarray],
+    ) -> List[Dict[str, Any]]:
+        """Run the vector similarity search and build result dictionaries."""
         # Vector similarity search
-        query_embedding = self.embed_text(query)
-        vector_results = self.vector_store.search(query_embedding, fetch_k)
-        
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        with self.lock:
+            vector_results = self.vector_store.search(query_embedding, fetch_k)
+            return self._build_results(vector_results, include_graph_context)
+    
+    def _build_results(
+        self,
+        vector_results: List[Tuple[int, float, Optional[str]]],
+        include_graph_context: bool,
+    ) -> List[Dict[str, Any]]:
+        """Build result dictionaries from vector store matches."""
         results = []
         for id_, score, text in vector_results:
+            doc_id = self._doc_ids.get(id_)
             result = {
                 "id": id_,
+                "doc_id": doc_id,
                 "score": 1 - score,  # Convert distance to similarity
                 "content": text,
             }
             
             if include_graph_context:
-                # Try to find related entities from graph
-                # Note: We'd need a mapping from vector ID to doc_id
-                result["entities"] = []
+                # Entities mentioned by the matched document
+                result["entities"] = (
+                    self.graph_store.get_document_entities(doc_id) if doc_id else []
+                )
             
             results.append(result)
         
+        return results
+    
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        include_graph_context: bool = True,
+        use_reranker: Optional[bool] = None,
+        rerank_top_k: Optional[int] = None,
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieve relevant documents for a query.
+        
+        Args:
+            query: Search query.
+            top_k: Number of results to return.
+            include_graph_context: Whether to include related entities.
+            use_reranker: Whether to use reranking. Defaults to self.use_reranker.
+            rerank_top_k: Number of candidates to fetch for reranking (default: top_k * 3).
+            query_embedding: Precomputed embedding of the query. Computed
+                with embed_query() if not given.
+            
+        Returns:
+            List of retrieval results with content and metadata.
+        """
+        should_rerank, fetch_k = self._rerank_plan(top_k, use_reranker, rerank_top_k)
+        results = self._vector_candidates(
+            query, fetch_k, include_graph_context, query_embedding
+        )
+        
         # Apply reranking if enabled
         if should_rerank and results:
             results = self.reranker.rerank_results(query, results, top_k=top_k)
         
         return results
     
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        include_graph_context: bool = True,
+        use_reranker: Optional[bool] = None,
+        rerank_top_k: Optional[int] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Retrieve relevant documents for several queries.
+        
+        The queries are embedded together and searched with one vector
+        store call; reranking, if enabled, then runs per query.
+        
+        Args:
+            queries: Search queries.
+            top_k: Number of results to return per query.
+            include_graph_context: Whether to include related entities.
+            use_reranker: Whether to use reranking. Defaults to self.use_reranker.
+            rerank_top_k: Number of candidates to fetch for reranking (default: top_k * 3).
+            
+        Returns:
+            One list of retrieval results per query, in input order.
+        """
+        if not queries:
+            return []
+        
+        should_rerank, fetch_k = self._rerank_plan(top_k, use_reranker, rerank_top_k)
+        query_embeddings = self.embed_queries(queries)
+        with self.lock:
+            candidates = [
+                self._build_results(vector_results, include_graph_context)
+                for vector_results in self.vector_store.batch_search(query_embeddings, fetch_k)
+            ]
+        
+        all_results = []
+        for query, results in zip(queries, candidates):
+            if should_rerank and results:
+                results = self.reranker.rerank_results(query, results, top_k=top_k)
+            all_results.append(results)
+        
+        return all_results
+    
+    async def aretrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        include_graph_context: bool = True,
+        use_reranker: Optional[bool] = None,
+        rerank_top_k: Optional[int] = None,
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Async variant of retrieve() for use inside an event loop.
+        
+        Reranking goes through async_reranker when it is running, so
+        concurrent queries share cross-encoder calls; otherwise the
+        synchronous reranker runs in a worker thread. The vector search
+        and graph lookups run in a worker thread as well.
+        
+        Args:
+            query: Search query.
+            top_k: Number of results to return.
+            include_graph_context: Whether to include related entities.
+            use_reranker: Whether to use reranking. Defaults to self.use_reranker.
+            rerank_top_k: Number of candidates to fetch for reranking (default: top_k * 3).
+            query_embedding: Precomputed embedding of the query.
+            
+        Returns:
+            List of retrieval results with content and metadata.
+        """
+        should_rerank, fetch_k = self._rerank_plan(top_k, use_reranker, rerank_top_k)
+        # The lookups wait for the engine lock, which batch inserts hold
+        # for a while, so keep them off the event loop
+        results = await asyncio.to_thread(
+            self._vector_candidates,
+            query, fetch_k, include_graph_context, query_embedding,
+        )
+        
+        if should_rerank and results:
+            if self.async_reranker is not None and self.async_reranker.running:
+                results = await self.async_reranker.rerank_results(
+                    query, results, top_k=top_k
+                )
+            else:
+                results = await asyncio.to_thread(
+                    self.reranker.rerank_results, query, results, top_k=top_k
+                )
+        
+        return results
+    
     def retrieve_with_graph(
         self,
         query: str,
         entity_name: Optional[str] = None,
         top_k: int = 5,
+        query_embedding: Optional[np.ndarray] = None,
     ) -> Dict[str, Any]:
         """
         Retrieve information combining vector search and graph traversal.
@@ -179,24 +615,29 @@ class RAGEngine:
             query: Search query.
             entity_name: Optional entity name to search for.
             top_k: Number of vector results to return.
+            query_embedding: Precomputed embedding of the query.
             
         Returns:
             Combined retrieval results.
         """
         # Vector search
-        vector_results = self.retrieve(query, top_k, include_graph_context=False)
+        vector_results = self.retrieve(
+            query, top_k, include_graph_context=False,
+            query_embedding=query_embedding,
+        )
         
         # Graph search
         graph_results = {}
         if entity_name:
-            entities = self.graph_store.search_entities(entity_name)
-            graph_results["entities"] = entities
-            
-            # Get related entities for each found entity
-            for entity in entities:
-                if "e.id" in entity:
-                    related = self.graph_store.get_related_entities(entity["e.id"])
-                    entity["related_entities"] = related
+            with self.lock:
+                entities = self.graph_store.search_entities(entity_name)
+                graph_results["entities"] = entities
+                
+                # Get related entities for each found entity
+                for entity in entities:
+                    if "e.id" in entity:
+                        related = self.graph_store.get_related_entities(entity["e.id"])
+                        entity["related_entities"] = related
         
         return {
             "vector_results": vector_results,
@@ -215,27 +656,19 @@ class RAGEngine:
         Args:
             query: Search query.
             top_k: Number of documents to retrieve.
-            max_tokens: Approximate maximum tokens in context.
+            max_tokens: Maximum tokens in context. Counted with tiktoken
+                when installed, otherwise estimated from characters.
             
         Returns:
             Concatenated context string.
         """
         results = self.retrieve(query, top_k)
+        contents = [r["content"] for r in results if r.get("content")]
         
-        context_parts = []
-        total_chars = 0
-        char_limit = max_tokens * 4  # Rough approximation
-        
-        for result in results:
-            content = result.get("content", "")
-            if content and total_chars + len(content) <= char_limit:
-                context_parts.append(content)
-                total_chars += len(content)
-            elif content:
-                # Truncate if needed
-                remaining = char_limit - total_chars
-                if remaining > 100:
-                    context_parts.append(content[:remaining])
-                break
+        encoding = _context_encoding()
+        if encoding is not None:
+            context_parts = _fit_tokens(contents, max_tokens, encoding)
+        else:
+            context_parts = _fit_chars(contents, max_tokens)
         
         return "\n\n---\n\n".join(context_parts)
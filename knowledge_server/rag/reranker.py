@@ -3,10 +3,17 @@ Reranker Module for improving retrieval quality.
 Uses cross-encoder models to rerank retrieved documents.
 """
 
-from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+import numpy as np
 from sentence_transformers import CrossEncoder
 
+from knowledge_server.rag.batching import MicroBatcher
+from knowledge_server.cache import LRUCache
+from knowledge_server.rag.model_cache import model_kwargs_for_device
+
 
 # Available reranker models with their characteristics
 RERANKER_MODELS = {
@@ -40,6 +47,11 @@ RERANKER_MODELS = {
 # Default model - good balance of speed and accuracy
 DEFAULT_RERANKER_MODEL = "ms-marco-MiniLM-L-6-v2"
 
+# All models above are encoder-only cross-encoders (BERT / XLM-RoBERTa). They
+# attend bidirectionally over the concatenated query and document, so there
+# is no document-side KV cache to reuse across queries; repeated work is
+# avoided by caching (query, document) scores instead.
+
 
 class Reranker:
     """
@@ -53,6 +65,10 @@ class Reranker:
         self,
         model_name: str = DEFAULT_RERANKER_MODEL,
         device: Optional[str] = None,
+        cache_size: int = 8192,
+        half_precision: bool = True,
+        compile_model: bool = False,
+        prune_ratio: Optional[float] = None,
     ):
         """
         Initialize the reranker.
@@ -60,6 +76,16 @@ class Reranker:
         Args:
             model_name: Name of the reranker model (see RERANKER_MODELS for options).
             device: Device to run the model on ('cpu', 'cuda', etc.). Auto-detected if None.
+            cache_size: Number of (query, document) scores to keep for
+                repeated queries (0 disables the cache).
+            half_precision: Load weights in bfloat16 on GPUs that support it.
+            compile_model: Compile the transformer with torch.compile. The
+                first batches are slower while kernels are generated.
+            prune_ratio: In rerank_results, skip the cross-encoder for results
+                whose retrieval score is below this fraction of the best
+                one. Off by default (None or 0); only meaningful when the
+                retrieval scores are similarities on a fixed scale, such
+                as cosine similarity.
         """
         if model_name in RERANKER_MODELS:
             self.model_info = RERANKER_MODELS[model_name]
@@ -74,14 +100,155 @@ class Reranker:
             full_model_name = model_name
         
         self.model_name = model_name
-        self.model = CrossEncoder(full_model_name, device=device)
+        self.model = CrossEncoder(
+            full_model_name,
+            device=device,
+            model_kwargs=model_kwargs_for_device(device) if half_precision else {},
+        )
+        if compile_model:
+            # Batches vary in sequence length, so compile for dynamic shapes
+            self.model.model.compile(dynamic=True)
         self.max_length = self.model_info.get("max_length", 512)
+        self.prune_ratio = prune_ratio
+        self._score_cache = LRUCache(cache_size)
+    
+    @staticmethod
+    def _document_key(document: str) -> bytes:
+        """Return a compact fixed-size key for a document text."""
+        return hashlib.blake2b(document.encode("utf-8"), digest_size=16).digest()
+    
+    def score_pairs(
+        self,
+        pairs: List[Tuple[str, str]],
+        batch_size: int = 32,
+    ) -> np.ndarray:
+        """
+        Score (query, document) pairs with the cross-encoder.
+        
+        Pairs may come from different queries. Scores of recently seen pairs
+        are taken from the cache; only the rest are run through the model.
+        
+        Args:
+            pairs: List of (query, document_text) pairs.
+            batch_size: Number of pairs scored per forward pass.
+            
+        Returns:
+            Array of relevance scores in input order.
+        """
+        # Reuse scores of pairs seen recently; only score the rest
+        keys = [(query, self._document_key(doc)) for query, doc in pairs]
+        scores = np.empty(len(pairs), dtype=np.float32)
+        missing = []
+        for i, key in enumerate(keys):
+            score = self._score_cache.get(key)
+            if score is None:
+                missing.append(i)
+            else:
+                scores[i] = score
+        
+        if missing:
+            # Smart batching: score pairs in length order so each batch pads
+            # to similar lengths, then scatter the scores back to input order
+            missing.sort(key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+            
+            # Get relevance scores from cross-encoder
+            predicted = self.model.predict(
+                [list(pairs[i]) for i in missing],
+                batch_size=batch_size,
+                show_progress_bar=False,
+            )
+            predicted = np.asarray(predicted, dtype=np.float32).tolist()
+            for i, score in zip(missing, predicted):
+                scores[i] = score
+                self._score_cache.put(keys[i], score)
+        
+        return scores
+    
+    @staticmethod
+    def _rank(
+        documents: List[str],
+        scores: Sequence[float],
+        top_k: Optional[int] = None,
+    ) -> List[Tuple[int, float, str]]:
+        """Order documents by score, keeping their original indices."""
+        neg_scores = -np.asarray(scores, dtype=np.float32)
+        
+        if top_k is not None and top_k < len(neg_scores):
+            # Select the top_k in linear time, then sort only those
+            order = np.argpartition(neg_scores, top_k)[:top_k]
+            order = order[np.argsort(neg_scores[order], kind="stable")]
+        else:
+            order = np.argsort(neg_scores, kind="stable")
+        
+        indices = order.tolist()
+        ranked_scores = (-neg_scores[order]).tolist()
+        return [
+            (idx, score, documents[idx]) for idx, score in zip(indices, ranked_scores)
+        ]
+    
+    @staticmethod
+    def _prune(
+        results: List[Dict[str, Any]],
+        prune_ratio: Optional[float],
+    ) -> Tuple[List[int], List[int]]:
+        """Split result indices into candidates to rerank and pruned ones."""
+        if prune_ratio is None or prune_ratio <= 0:
+            return list(range(len(results))), []
+        
+        scores = np.array([r.get("score", 0) for r in results], dtype=np.float32)
+        best = scores.max()
+        
+        # Similarities can be negative; a ratio of a non-positive best means nothing
+        if best <= 0:
+            return list(range(len(results))), []
+        
+        keep = scores >= best * prune_ratio
+        return np.flatnonzero(keep).tolist(), np.flatnonzero(~keep).tolist()
+    
+    @staticmethod
+    def _apply_ranking(
+        results: List[Dict[str, Any]],
+        ranking: List[Tuple[int, float, str]],
+        top_k: Optional[int] = None,
+        candidates: Optional[List[int]] = None,
+        pruned: Sequence[int] = (),
+    ) -> List[Dict[str, Any]]:
+        """
+        Reorder result dictionaries by a ranking and update their scores.
+        
+        Ranking indices refer to positions in candidates, or in results if
+        candidates is None. Pruned results follow in retrieval order.
+        """
+        if candidates is not None:
+            ranking = [(candidates[idx], score, doc) for idx, score, doc in ranking]
+        
+        # Build each reranked result in one allocation; inputs stay untouched
+        reranked_results = [
+            {
+                **results[original_idx],
+                "original_score": results[original_idx].get("score", 0),
+                "score": new_score,
+                "reranked": True,
+            }
+            for original_idx, new_score, _ in ranking
+        ]
+        if top_k is None or len(reranked_results) < top_k:
+            reranked_results.extend(
+                {**results[idx], "reranked": False} for idx in pruned
+            )
+        
+        # Return top_k if specified
+        if top_k is not None and top_k < len(reranked_results):
+            reranked_results = reranked_results[:top_k]
+        
+        return reranked_results
     
     def rerank(
         self,
         query: str,
         documents: List[str],
         top_k: Optional[int] = None,
+        batch_size: int = 32,
     ) -> List[Tuple[int, float, str]]:
         """
         Rerank documents based on relevance to the query.
@@ -90,6 +257,7 @@ class Reranker:
             query: The search query.
             documents: List of document texts to rerank.
             top_k: Number of top documents to return. Returns all if None.
+            batch_size: Number of query-document pairs scored per forward pass.
             
         Returns:
             List of tuples (original_index, score, document_text) sorted by score descending.
@@ -97,24 +265,8 @@ class Reranker:
         if not documents:
             return []
         
-        # Create query-document pairs
-        pairs = [[query, doc] for doc in documents]
-        
-        # Get relevance scores from cross-encoder
-        scores = self.model.predict(pairs)
-        
-        # Combine with original indices and sort by score
-        results = [
-            (idx, float(score), doc) 
-            for idx, (score, doc) in enumerate(zip(scores, documents))
-        ]
-        results.sort(key=lambda x: x[1], reverse=True)
-        
-        # Return top_k if specified
-        if top_k is not None and top_k < len(results):
-            results = results[:top_k]
-        
-        return results
+        scores = self.score_pairs([(query, doc) for doc in documents], batch_size)
+        return self._rank(documents, scores, top_k)
     
     def rerank_results(
         self,
@@ -133,31 +285,22 @@ class Reranker:
             top_k: Number of top results to return. Returns all if None.
             
         Returns:
-            Reranked results with updated scores.
+            Reranked results with updated scores, followed by any results
+            pruned before reranking (marked with reranked=False).
         """
         if not results:
             return []
         
+        # Optionally skip the cross-encoder for results too weak to win
+        candidates, pruned = self._prune(results, self.prune_ratio)
+        
         # Extract documents
-        documents = [r.get(content_key, "") for r in results]
+        documents = [results[i].get(content_key, "") for i in candidates]
         
         # Rerank
-        reranked = self.rerank(query, documents, top_k=None)
-        
-        # Build reranked results
-        reranked_results = []
-        for original_idx, new_score, _ in reranked:
-            result = results[original_idx].copy()
-            result["original_score"] = result.get("score", 0)
-            result["score"] = new_score
-            result["reranked"] = True
-            reranked_results.append(result)
-        
-        # Return top_k if specified
-        if top_k is not None and top_k < len(reranked_results):
-            reranked_results = reranked_results[:top_k]
+        reranked = self.rerank(query, documents, top_k=top_k)
         
-        return reranked_results
+        return self._apply_ranking(results, reranked, top_k, candidates, pruned)
     
     @staticmethod
     def list_available_models() -> Dict[str, Dict[str, str]]:
@@ -180,3 +323,99 @@ class Reranker:
             "model_name": self.model_name,
             **self.model_info,
         }
+
+
+class AsyncReranker:
+    """
+    Rerank from coroutines, sharing cross-encoder calls between requests.
+    
+    Pairs submitted by concurrent queries are coalesced by a MicroBatcher,
+    so one predict() call scores the candidates of several requests.
+    """
+    
+    def __init__(
+        self,
+        reranker: Reranker,
+        max_batch: int = 64,
+        max_wait: float = 0.02,
+    ):
+        """
+        Initialize the async reranker.
+        
+        Args:
+            reranker: Reranker used to score the pairs.
+            max_batch: Maximum number of pairs per predict() call.
+            max_wait: Maximum time in seconds to wait for a batch to fill.
+        """
+        self.reranker = reranker
+        self._batcher = MicroBatcher(self._score, max_batch=max_batch, max_wait=max_wait)
+    
+    @property
+    def running(self) -> bool:
+        """Whether the background batching task is running."""
+        return self._batcher.running
+    
+    async def start(self) -> None:
+        """Start the background batching task."""
+        await self._batcher.start()
+    
+    async def stop(self) -> None:
+        """Stop the background batching task."""
+        await self._batcher.stop()
+    
+    def _score(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        """Score one coalesced batch of pairs."""
+        return self.reranker.score_pairs(pairs, batch_size=self._batcher.max_batch)
+    
+    async def rerank(
+        self,
+        query: str,
+        documents: List[str],
+        top_k: Optional[int] = None,
+    ) -> List[Tuple[int, float, str]]:
+        """
+        Rerank documents based on relevance to the query.
+        
+        Args:
+            query: The search query.
+            documents: List of document texts to rerank.
+            top_k: Number of top documents to return. Returns all if None.
+            
+        Returns:
+            List of tuples (original_index, score, document_text) sorted by score descending.
+        """
+        if not documents:
+            return []
+        
+        scores = await asyncio.gather(
+            *(self._batcher.submit((query, doc)) for doc in documents)
+        )
+        return Reranker._rank(documents, scores, top_k)
+    
+    async def rerank_results(
+        self,
+        query: str,
+        results: List[Dict[str, Any]],
+        content_key: str = "content",
+        top_k: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Rerank retrieval results and update their scores.
+        
+        Args:
+            query: The search query.
+            results: List of result dictionaries from retrieval.
+            content_key: Key to access document content in results.
+            top_k: Number of top results to return. Returns all if None.
+            
+        Returns:
+            Reranked results with updated scores, followed by any results
+            pruned before reranking (marked with reranked=False).
+        """
+        if not results:
+            return []
+        
+        candidates, pruned = Reranker._prune(results, self.reranker.prune_ratio)
+        documents = [results[i].get(content_key, "") for i in candidates]
+        reranked = await self.rerank(query, documents, top_k=top_k)
+        return Reranker._apply_ranking(results, reranked, top_k, candidates, pruned)
@@ -2,62 +2,175 @@
 Scrapy runner for managing crawl jobs.
 """
 
+import asyncio
+import importlib.util
 import ipaddress
 import json
 import os
 import socket
 import tempfile
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
 from urllib.parse import urlparse
 
+import lxml.html
 from scrapy import signals
 from scrapy.crawler import CrawlerProcess
 from scrapy.signalmanager import dispatcher
 
-from knowledge_server.scrapy_server.spider import ContentSpider, SimpleSpider
+from knowledge_server.cache import LRUCache
+
+# orjson is optional; when installed, result files are encoded much faster
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+__all__ = [
+    "AsyncScrapyRunner",
+    "ScrapyRunner",
+    "compile_allowed_domains",
+    "is_allowed_domain",
+    "is_private_ip",
+    "parse_html",
+    "validate_url",
+    "write_json",
+]
 
 
 # Allowed URL schemes for scraping (prevent SSRF)
 ALLOWED_SCHEMES = {"http", "https"}
 
 
+# Networks that scraped URLs must never reach (prevent SSRF)
+PRIVATE_NETWORKS = tuple(
+    ipaddress.ip_network(cidr)
+    for cidr in (
+        "0.0.0.0/8",
+        "10.0.0.0/8",
+        "100.64.0.0/10",  # Carrier-grade NAT
+        "127.0.0.0/8",
+        "169.254.0.0/16",  # Link-local
+        "172.16.0.0/12",
+        "192.168.0.0/16",
+        "::/128",
+        "::1/128",
+        "fc00::/7",  # Unique local
+        "fe80::/10",  # Link-local
+    )
+)
+
+
+# Resolved addresses per hostname. Entries expire so a name that is later
+# rebound to a private address is looked up again.
+_RESOLVE_CACHE = LRUCache(maxsize=1024, ttl=60.0)
+
+
+def _resolve(hostname: str) -> FrozenSet[str]:
+    """
+    Resolve a hostname to its IP addresses.
+    
+    Successful lookups are cached for a short time so repeated URLs on the
+    same host do not hit DNS again. Failed lookups are not cached.
+    
+    Args:
+        hostname: Hostname to resolve.
+        
+    Returns:
+        The resolved addresses, or an empty set if resolution fails.
+    """
+    addresses = _RESOLVE_CACHE.get(hostname)
+    if addresses is not None:
+        return addresses
+    try:
+        addresses = frozenset(
+            info[4][0] for info in socket.getaddrinfo(hostname, None)
+        )
+    except (socket.gaierror, UnicodeError):
+        return frozenset()
+    if addresses:
+        _RESOLVE_CACHE.put(hostname, addresses)
+    return addresses
+
+
+def _is_private_address(address: str) -> bool:
+    """Check if a literal IP address is in a private or reserved network."""
+    # Scoped IPv6 addresses ("fe80::1%eth0") carry an interface suffix
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    if ip.is_private or ip.is_loopback or ip.is_reserved:
+        return True
+    return any(ip in network for network in PRIVATE_NETWORKS)
+
+
 def is_private_ip(hostname: str) -> bool:
     """
     Check if a hostname resolves to a private IP address.
     
+    Literal addresses are checked directly. Names are resolved via DNS
+    and rejected if any of their addresses is private, so a public name
+    pointing at 127.0.0.1 is caught as well. Names that cannot be resolved
+    are treated as private.
+    
     Args:
         hostname: Hostname to check.
         
     Returns:
-        True if the hostname resolves to a private IP.
+        True if the hostname resolves to a private IP or does not resolve.
     """
-    # Check common private hostnames
-    private_hostnames = {"localhost", "127.0.0.1", "0.0.0.0", "::1"}
-    if hostname.lower() in private_hostnames:
+    hostname = hostname.lower().rstrip(".")
+    if hostname == "localhost" or hostname.endswith(".localhost"):
         return True
     
     # Try to parse as IP address directly
     try:
-        ip = ipaddress.ip_address(hostname)
-        return ip.is_private or ip.is_loopback or ip.is_reserved
+        return _is_private_address(hostname)
     except ValueError:
         pass
     
-    # Check for private IP patterns in hostname
-    private_prefixes = (
-        "10.", "192.168.", "172.16.", "172.17.", "172.18.", "172.19.",
-        "172.20.", "172.21.", "172.22.", "172.23.", "172.24.", "172.25.",
-        "172.26.", "172.27.", "172.28.", "172.29.", "172.30.", "172.31.",
-        "169.254.",  # Link-local
-    )
-    if hostname.startswith(private_prefixes):
+    addresses = _resolve(hostname)
+    if not addresses:
         return True
+    return any(_is_private_address(address) for address in addresses)
+
+
+def compile_allowed_domains(domains: Iterable[str]) -> FrozenSet[str]:
+    """
+    Build the lookup set used by validate_url for an allowed-domains list.
+    
+    Callers validating many URLs against the same list can build the set
+    once and pass it to validate_url directly.
     
-    return False
+    Args:
+        domains: Allowed domains.
+        
+    Returns:
+        Lower-cased domains without trailing dots.
+    """
+    return frozenset(domain.lower().rstrip(".") for domain in domains)
 
 
-def validate_url(url: str, allowed_domains: Optional[List[str]] = None) -> str:
+def is_allowed_domain(hostname: str, allowed_domains: FrozenSet[str]) -> bool:
+    """
+    Check if a hostname is one of the allowed domains or a subdomain of one.
+    
+    Args:
+        hostname: Lower-cased hostname to check.
+        allowed_domains: Set built by compile_allowed_domains().
+        
+    Returns:
+        True if the hostname or one of its parent domains is allowed.
+    """
+    labels = hostname.rstrip(".").split(".")
+    return any(
+        ".".join(labels[i:]) in allowed_domains for i in range(len(labels))
+    )
+
+
+def validate_url(
+    url: str, allowed_domains: Optional[Iterable[str]] = None
+) -> str:
     """
     Validate and sanitize URL to prevent SSRF attacks.
     
@@ -65,6 +178,7 @@ def validate_url(url: str, allowed_domains: Optional[List[str]] = None) -> str:
         url: URL to validate.
         allowed_domains: Optional list of allowed domains. If provided,
                         only URLs from these domains will be allowed.
+                        A set from compile_allowed_domains() is used as is.
         
     Returns:
         The validated URL string.
@@ -87,20 +201,18 @@ def validate_url(url: str, allowed_domains: Optional[List[str]] = None) -> str:
         if not hostname:
             raise ValueError("URL must have a valid host.")
         
+        # Check against allowed domains first; it is cheap and spares a
+        # DNS lookup for hosts that would be rejected anyway
+        if allowed_domains:
+            if not isinstance(allowed_domains, frozenset):
+                allowed_domains = compile_allowed_domains(allowed_domains)
+            if not is_allowed_domain(hostname, allowed_domains):
+                raise ValueError(f"Domain '{hostname}' is not in the allowed domains list.")
+        
         # Check for private/internal IPs
         if is_private_ip(hostname):
             raise ValueError("URLs to private or internal addresses are not allowed.")
         
-        # Check against allowed domains if specified
-        if allowed_domains:
-            domain_match = False
-            for domain in allowed_domains:
-                if hostname == domain or hostname.endswith(f".{domain}"):
-                    domain_match = True
-                    break
-            if not domain_match:
-                raise ValueError(f"Domain '{hostname}' is not in the allowed domains list.")
-        
         # Reconstruct URL to ensure it's properly formed
         return url
         
@@ -110,6 +222,54 @@ def validate_url(url: str, allowed_domains: Optional[List[str]] = None) -> str:
         raise ValueError(f"Invalid URL: {e}")
 
 
+def write_json(data: Any, path: str) -> None:
+    """
+    Write data to a UTF-8 JSON file indented by two spaces.
+    
+    Args:
+        data: JSON-serializable data.
+        path: Output file path.
+    """
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def parse_html(html: str) -> Dict[str, str]:
+    """
+    Extract the title and paragraph text from an HTML page.
+    
+    Args:
+        html: Page source.
+        
+    Returns:
+        Dictionary with "title" and "content" keys.
+    """
+    if not html.strip():
+        return {"title": "Untitled", "content": ""}
+    
+    # Parse from bytes so pages with an XML encoding declaration are accepted.
+    # A parser per call keeps concurrent parses in worker threads independent.
+    parser = lxml.html.HTMLParser(encoding="utf-8")
+    tree = lxml.html.fromstring(html.encode("utf-8"), parser=parser)
+    
+    title = tree.find(".//title")
+    
+    # One join over the non-empty paragraphs; whitespace-only paragraphs
+    # and their padding never reach the result string
+    paragraphs = [
+        text for text in (p.text_content().strip() for p in tree.iter("p")) if text
+    ]
+    
+    return {
+        "title": title.text_content().strip() if title is not None else "Untitled",
+        "content": " ".join(paragraphs),
+    }
+
+
 class ScrapyRunner:
     """Runner for managing Scrapy crawl jobs."""
     
@@ -131,12 +291,24 @@ class ScrapyRunner:
         self.default_settings = {
             "LOG_LEVEL": "WARNING",
             "ROBOTSTXT_OBEY": True,
+            # DOWNLOAD_DELAY applies per domain, so crawls spanning many
+            # domains need a high global limit to keep every domain busy
             "DOWNLOAD_DELAY": 1,
-            "CONCURRENT_REQUESTS": 4,
+            "CONCURRENT_REQUESTS": 200,
+            "CONCURRENT_REQUESTS_PER_DOMAIN": 16,
             "DEPTH_LIMIT": 2,
             "FEEDS": {},
+            "TWISTED_REACTOR": "twisted.internet.asyncioreactor.AsyncioSelectorReactor",
+            "REACTOR_THREADPOOL_MAXSIZE": 20,
+            "DNS_RESOLVER": "scrapy.resolver.CachingHostnameResolver",
         }
         
+        # Scrapy's HTTP/2 handler needs the optional h2 package
+        if importlib.util.find_spec("h2") is not None:
+            self.default_settings["DOWNLOAD_HANDLERS"] = {
+                "https": "scrapy.core.downloader.handlers.http2.H2DownloadHandler",
+            }
+        
         if settings:
             self.default_settings.update(settings)
         
@@ -165,6 +337,9 @@ class ScrapyRunner:
         Returns:
             List of scraped content dictionaries.
         """
+        # Imported here because the spiders use this module's domain checks
+        from knowledge_server.scrapy_server.spider import ContentSpider, SimpleSpider
+        
         self.results = []
         
         settings = self.default_settings.copy()
@@ -211,8 +386,7 @@ class ScrapyRunner:
         results = self.scrape_urls(urls, allowed_domains, follow_links)
         
         output_path = os.path.join(self.output_dir, output_file)
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        write_json(results, output_path)
         
         return output_path
 
@@ -224,6 +398,7 @@ class AsyncScrapyRunner:
         self,
         output_dir: Optional[str] = None,
         settings: Optional[Dict[str, Any]] = None,
+        max_concurrent: int = 4,
     ):
         """
         Initialize the async Scrapy runner.
@@ -231,10 +406,43 @@ class AsyncScrapyRunner:
         Args:
             output_dir: Directory to store scraped data.
             settings: Optional Scrapy settings override.
+            max_concurrent: Maximum number of pages fetched at once.
         """
         self.output_dir = output_dir or tempfile.mkdtemp()
         Path(self.output_dir).mkdir(parents=True, exist_ok=True)
         self.settings = settings or {}
+        self.max_concurrent = max_concurrent
+        self._session = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+    
+    def _get_session(self):
+        """Get the shared HTTP session, creating it on first use."""
+        import aiohttp
+        
+        if self._session is None or self._session.closed:
+            # aiohttp already advertises every encoding it can decode
+            # (gzip, deflate, and br/zstd when available) by default.
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=100,
+                    limit_per_host=8,
+                    ttl_dns_cache=300,
+                ),
+                timeout=aiohttp.ClientTimeout(total=30),
+            )
+        return self._session
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Get the fetch limiter, creating it inside the running event loop."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphore
+    
+    async def aclose(self) -> None:
+        """Close the shared HTTP session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
     
     async def scrape_url(self, url: str) -> Dict[str, Any]:
         """
@@ -245,7 +453,7 @@ class AsyncScrapyRunner:
         
         Security: The URL is validated by validate_url() which:
         - Only allows http/https schemes
-        - Blocks private/internal IP addresses (localhost, 10.x, 192.168.x, etc.)
+        - Blocks hosts resolving to private/internal IP addresses (localhost, 10.x, 192.168.x, etc.)
         - Can be restricted to specific allowed domains
         
         Args:
@@ -257,24 +465,42 @@ class AsyncScrapyRunner:
         Raises:
             ValueError: If URL is invalid or unsafe.
         """
-        import aiohttp
-        from bs4 import BeautifulSoup
-        
         # Validate URL to prevent SSRF - this validates and returns the safe URL
-        # Security note: validate_url() checks scheme and blocks private IPs
-        validated_url = validate_url(url)
+        # Security note: validate_url() checks scheme and blocks private IPs.
+        # It may resolve the hostname, so keep the blocking lookup off the loop.
+        validated_url = await asyncio.to_thread(validate_url, url)
+        
+        # Reuse one session so connections are pooled across requests
+        session = self._get_session()
         
-        async with aiohttp.ClientSession() as session:
+        # Bound concurrent fetches across all callers sharing this runner
+        async with self._get_semaphore():
             # The URL has been validated to prevent SSRF attacks
             async with session.get(validated_url) as response:  # nosec B310
                 html = await response.text()
-                soup = BeautifulSoup(html, "html.parser")
-                
-                title = soup.find("title")
-                paragraphs = soup.find_all("p")
-                
-                return {
-                    "url": validated_url,
-                    "title": title.get_text().strip() if title else "Untitled",
-                    "content": " ".join(p.get_text() for p in paragraphs).strip(),
-                }
+        
+        # Parsing is CPU-bound; run it in a thread so other fetches progress
+        page = await asyncio.to_thread(parse_html, html)
+        
+        return {"url": validated_url, **page}
+    
+    async def scrape_urls(
+        self, urls: List[str], return_exceptions: bool = False
+    ) -> List[Any]:
+        """
+        Scrape several URLs concurrently.
+        
+        Fetches share the runner's session and are bounded by max_concurrent.
+        
+        Args:
+            urls: URLs to scrape.
+            return_exceptions: Return failures in place of their results
+                              instead of raising the first one.
+            
+        Returns:
+            Scraped content dictionaries (or exceptions), in input order.
+        """
+        return await asyncio.gather(
+            *(self.scrape_url(url) for url in urls),
+            return_exceptions=return_exceptions,
+        )
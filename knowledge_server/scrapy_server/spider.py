@@ -2,11 +2,150 @@
 Scrapy spider for web content scraping.
 """
 
+import io
+from itertools import chain
+
 import scrapy
+from lxml import etree
 from scrapy.crawler import CrawlerProcess
 from scrapy.spiders import CrawlSpider, Rule
 from scrapy.linkextractors import LinkExtractor
-from typing import Any, Dict, Generator, List, Optional
+from typing import Any, Dict, Generator, Iterable, Iterator, List, Optional
+from urllib.parse import urlparse
+
+from knowledge_server.scrapy_server.runner import (
+    compile_allowed_domains,
+    is_allowed_domain,
+)
+
+
+# Elements parse_content reads, collected in a single walk over the page
+_CONTENT_TAGS = ("title", "h1", "h2", "h3", "p", "a")
+
+# Compiled once at import; parsel would re-parse a selector string per response
+_TITLE_TEXT = etree.XPath("//title/text()", smart_strings=False)
+
+# Per-page limits on extracted content length, heading text nodes and links
+MAX_CONTENT_CHARS = 200_000
+MAX_HEADINGS = 200
+MAX_LINKS = 20
+
+
+def _text_nodes(element) -> Iterator[str]:
+    """Yield an element's own text nodes, as the ``::text`` selector does."""
+    if element.text is not None:
+        yield element.text
+    for child in element:
+        if child.tail is not None:
+            yield child.tail
+
+
+def _join_bounded(texts: Iterable[str], max_chars: int) -> str:
+    """
+    Join texts with spaces, stopping once the result reaches max_chars.
+    
+    Texts past the limit are never read, so long pages cost no more than
+    the limit to process and keep in memory.
+    """
+    buffer = io.StringIO()
+    size = 0
+    for text in texts:
+        if size:
+            buffer.write(" ")
+            size += 1
+        if size + len(text) >= max_chars:
+            buffer.write(text[:max_chars - size])
+            break
+        buffer.write(text)
+        size += len(text)
+    return buffer.getvalue()
+
+
+def _paragraph_texts(paragraphs) -> Iterator[str]:
+    """Yield the text nodes of paragraph elements, as ``p::text`` does."""
+    return chain.from_iterable(map(_text_nodes, paragraphs))
+
+
+def extract_content(root, max_content_chars: int = MAX_CONTENT_CHARS) -> Dict[str, Any]:
+    """
+    Extract the fields ContentSpider yields from a parsed page.
+    
+    Title, paragraphs, headings and links are gathered in one pass over
+    the document instead of one selector query per field.
+    
+    Args:
+        root: Root lxml element of the page (``response.selector.root``).
+        max_content_chars: Maximum length of the joined paragraph text.
+        
+    Returns:
+        Dictionary with title, content, headings and links. The title
+        is None when the page has neither a title nor an h1.
+    """
+    title = None
+    first_h1 = None
+    paragraphs = []
+    headings: List[str] = []
+    # Dict keys keep the first occurrence of each link, in page order
+    links: Dict[str, None] = {}
+    
+    for element in root.iter(*_CONTENT_TAGS):
+        tag = element.tag
+        if tag == "p":
+            # Text is read after the walk, only up to the content limit
+            paragraphs.append(element)
+        elif tag == "a":
+            href = element.get("href")
+            if href is not None and len(links) < MAX_LINKS:
+                links[href] = None
+        elif tag == "title":
+            if title is None:
+                title = next(_text_nodes(element), None)
+        else:
+            texts = list(_text_nodes(element))
+            if tag == "h1" and first_h1 is None and texts:
+                first_h1 = texts[0]
+            if len(headings) < MAX_HEADINGS:
+                headings.extend(texts)
+    
+    return {
+        "title": title or first_h1,
+        "content": _join_bounded(_paragraph_texts(paragraphs), max_content_chars),
+        "headings": headings[:MAX_HEADINGS],
+        "links": list(links),
+    }
+
+
+class AllowedDomainLinkExtractor(LinkExtractor):
+    """
+    Link extractor that checks hosts against a set of allowed domains.
+    
+    LinkExtractor's allow_domains is matched per link by scanning the
+    domain list; this looks each host and its parent domains up in a
+    frozenset instead.
+    """
+    
+    def __init__(self, allowed_domains: Iterable[str] = (), **kwargs):
+        """
+        Initialize the link extractor.
+        
+        Args:
+            allowed_domains: Domains whose hosts and subdomains may be
+                followed. All domains are allowed when empty.
+            **kwargs: Other LinkExtractor arguments, except allow_domains.
+        """
+        super().__init__(**kwargs)
+        self._allowed_domains = compile_allowed_domains(allowed_domains)
+    
+    def _link_allowed(self, link) -> bool:
+        """Apply LinkExtractor's other filters, then the allowed domains."""
+        if not super()._link_allowed(link):
+            return False
+        if not self._allowed_domains:
+            return True
+        hostname = urlparse(link.url).hostname
+        return hostname is not None and is_allowed_domain(
+            hostname, self._allowed_domains
+        )
 
 
 class ContentSpider(CrawlSpider):
@@ -37,7 +176,7 @@ class ContentSpider(CrawlSpider):
         # Set up rules for following links
         self.rules = (
             Rule(
-                LinkExtractor(allow_domains=self.allowed_domains),
+                AllowedDomainLinkExtractor(self.allowed_domains),
                 callback="parse_content",
                 follow=True,
             ),
@@ -55,27 +194,15 @@ class ContentSpider(CrawlSpider):
         Yields:
             Dictionary with scraped content.
         """
-        # Extract title
-        title = response.css("title::text").get()
-        if not title:
-            title = response.css("h1::text").get() or "Untitled"
-        
-        # Extract main content
-        paragraphs = response.css("p::text").getall()
-        content = " ".join(paragraphs)
-        
-        # Extract headings
-        headings = response.css("h1::text, h2::text, h3::text").getall()
-        
-        # Extract links
-        links = response.css("a::attr(href)").getall()
+        page = extract_content(response.selector.root)
+        title = page["title"]
         
         yield {
             "url": response.url,
             "title": title.strip() if title else "Untitled",
-            "content": content.strip(),
-            "headings": headings,
-            "links": links[:20],  # Limit links
+            "content": page["content"].strip(),
+            "headings": page["headings"],
+            "links": page["links"],
         }
 
 
@@ -104,11 +231,13 @@ class SimpleSpider(scrapy.Spider):
         Yields:
             Dictionary with scraped content.
         """
-        title = response.css("title::text").get()
-        paragraphs = response.css("p::text").getall()
+        root = response.selector.root
+        titles = _TITLE_TEXT(root)
+        title = titles[0] if titles else None
+        content = _join_bounded(_paragraph_texts(root.iter("p")), MAX_CONTENT_CHARS)
         
         yield {
             "url": response.url,
             "title": title.strip() if title else "Untitled",
-            "content": " ".join(paragraphs).strip(),
+            "content": content.strip(),
         }
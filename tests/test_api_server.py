@@ -3,40 +3,79 @@ Tests for the API Server module.
 """
 
 import os
+import shutil
 import tempfile
+import threading
+import time
 
 import pytest
 from fastapi.testclient import TestClient
 
 
-def create_test_client():
-    """Create a test client, skip if embedding model unavailable."""
-    # Set up test environment
-    os.environ["KNOWLEDGE_DB_PATH"] = tempfile.mkdtemp()
+# Seconds to wait for the background engine initialization
+READY_TIMEOUT = 120
+
+
+@pytest.fixture(scope="session", autouse=True)
+def knowledge_db_path():
+    """Point the server at one temporary data directory for the session."""
+    path = tempfile.mkdtemp()
+    os.environ["KNOWLEDGE_DB_PATH"] = path
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def wait_until_ready(client: TestClient) -> None:
+    """Wait for the RAG engine, skip if the embedding model is unavailable."""
+    deadline = time.monotonic() + READY_TIMEOUT
+    while time.monotonic() < deadline:
+        response = client.get("/ready")
+        if response.status_code == 200:
+            return
+        if response.status_code == 500:
+            detail = response.json()["detail"].lower()
+            if "huggingface" in detail or "couldn't connect" in detail:
+                pytest.skip("Cannot load embedding model (no network access)")
+            pytest.fail(f"RAG engine failed to initialize: {detail}")
+        time.sleep(0.05)
+    pytest.fail("RAG engine did not initialize in time")
+
+
+@pytest.fixture(scope="module")
+def bare_client():
+    """Create a test client that does not start the RAG engine."""
+    from knowledge_server.api.server import app
     
-    try:
-        from knowledge_server.api.server import app
-        return TestClient(app)
-    except OSError as e:
-        if "huggingface" in str(e).lower() or "couldn't connect" in str(e).lower():
-            pytest.skip("Cannot load embedding model (no network access)")
-        raise
+    return TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def client():
+    """Start the app once and share its test client across the module."""
+    from knowledge_server.api.server import app
+    
+    # Entering the client runs the lifespan, which loads the engine
+    with TestClient(app) as client:
+        wait_until_ready(client)
+        yield client
 
 
 class TestAPIServer:
     """Test cases for the API server."""
     
-    @pytest.fixture
-    def client(self):
-        """Create a test client."""
-        return create_test_client()
-    
-    def test_health_check(self, client):
+    def test_health_check(self, bare_client):
         """Test health check endpoint."""
-        response = client.get("/health")
+        response = bare_client.get("/health")
         assert response.status_code == 200
         assert response.json() == {"status": "healthy"}
     
+    def test_ready_before_initialization(self, client, monkeypatch):
+        """Test that readiness fails until the RAG engine is loaded."""
+        monkeypatch.setattr(client.app.state, "rag_engine", None)
+        
+        response = client.get("/ready")
+        assert response.status_code == 503
+    
     def test_add_document(self, client):
         """Test adding a document."""
         response = client.post(
@@ -104,5 +143,92 @@ class TestAPIServer:
         assert "context" in response.json()
 
 
+class TestScrapedDocId:
+    """Test cases for scraped document IDs."""
+    
+    def test_stable_and_distinct(self):
+        """Test that IDs depend only on the URL, not the process."""
+        from knowledge_server.api.server import scraped_doc_id
+        
+        assert scraped_doc_id("https://example.com/page") == "scraped_bcc2e1ea2bc3ee50"
+        assert scraped_doc_id("https://example.com/other") != scraped_doc_id(
+            "https://example.com/page"
+        )
+
+
+class FakeScrapeRunner:
+    """Scrape runner that returns canned pages without network access."""
+    
+    async def scrape_urls(self, urls, return_exceptions=False):
+        return [
+            {"url": url, "title": f"Page {i}", "content": f"Content {i}"}
+            for i, url in enumerate(urls)
+        ]
+
+
+class FailingEngine:
+    """Engine stand-in whose document stores reject every insert."""
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.graph_store = self
+    
+    def get_document(self, doc_id):
+        return None
+    
+    def add_documents(self, documents, batch_size=64):
+        raise RuntimeError("index is full")
+
+
+class GraphOnlyEngine:
+    """Engine stand-in holding graph rows for every page but no vectors."""
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.graph_store = self
+        self.added = []
+    
+    def get_document(self, doc_id):
+        return {"d.title": "Page 0", "d.content": "Content 0"}
+    
+    def has_vector(self, doc_id):
+        return False
+    
+    def add_documents(self, documents, batch_size=64):
+        self.added.extend(documents)
+
+
+class TestScrape:
+    """Test cases for the scrape endpoint."""
+    
+    def test_ingest_error_keeps_scrape_results(self, bare_client, monkeypatch):
+        """Test that a failed insert is reported per page, not as a 500."""
+        state = bare_client.app.state
+        monkeypatch.setattr(state, "scrape_runner", FakeScrapeRunner(), raising=False)
+        monkeypatch.setattr(state, "rag_engine", FailingEngine(), raising=False)
+        
+        response = bare_client.post(
+            "/scrape",
+            json={"urls": ["https://example.com/a", "https://example.com/b"]},
+        )
+        
+        assert response.status_code == 200
+        scraped = response.json()["scraped"]
+        assert [page["title"] for page in scraped] == ["Page 0", "Page 1"]
+        assert all(page["ingest_error"] == "index is full" for page in scraped)
+    
+    def test_page_without_vector_is_added_again(self, bare_client, monkeypatch):
+        """Test that a stored page missing its vector is not skipped as unchanged."""
+        engine = GraphOnlyEngine()
+        state = bare_client.app.state
+        monkeypatch.setattr(state, "scrape_runner", FakeScrapeRunner(), raising=False)
+        monkeypatch.setattr(state, "rag_engine", engine, raising=False)
+        
+        response = bare_client.post("/scrape", json={"urls": ["https://example.com/a"]})
+        
+        assert response.status_code == 200
+        assert [doc["url"] for doc in engine.added] == ["https://example.com/a"]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,95 @@
+"""
+Tests for the micro-batching module.
+"""
+
+import asyncio
+
+import pytest
+
+from knowledge_server.rag.batching import MicroBatcher
+
+
+class TestMicroBatcher:
+    """Test cases for MicroBatcher."""
+
+    def test_concurrent_submits_share_a_batch(self):
+        """Test that concurrent items are processed in one call."""
+        calls = []
+
+        def batch_fn(items):
+            calls.append(list(items))
+            return [item * 2 for item in items]
+
+        async def run():
+            batcher = MicroBatcher(batch_fn, max_batch=8, max_wait=0.05)
+            await batcher.start()
+            try:
+                return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+            finally:
+                await batcher.stop()
+
+        results = asyncio.run(run())
+
+        assert results == [0, 2, 4, 6, 8]
+        assert calls == [[0, 1, 2, 3, 4]]
+
+    def test_max_batch(self):
+        """Test that batches never exceed max_batch items."""
+        calls = []
+
+        def batch_fn(items):
+            calls.append(len(items))
+            return items
+
+        async def run():
+            batcher = MicroBatcher(batch_fn, max_batch=2, max_wait=0.05)
+            await batcher.start()
+            try:
+                return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+            finally:
+                await batcher.stop()
+
+        assert asyncio.run(run()) == [0, 1, 2, 3, 4]
+        assert max(calls) <= 2
+        assert sum(calls) == 5
+
+    def test_error_propagates(self):
+        """Test that a failing batch raises in every caller."""
+        def batch_fn(items):
+            raise ValueError("boom")
+
+        async def run():
+            batcher = MicroBatcher(batch_fn)
+            await batcher.start()
+            try:
+                await batcher.submit("x")
+            finally:
+                await batcher.stop()
+
+        with pytest.raises(ValueError):
+            asyncio.run(run())
+
+    def test_stop_while_collecting(self):
+        """Test that items already taken into a batch fail when stopped."""
+        async def run():
+            batcher = MicroBatcher(lambda items: items, max_batch=8, max_wait=10)
+            await batcher.start()
+            pending = asyncio.create_task(batcher.submit(1))
+            # Let the batcher take the item and wait for more
+            await asyncio.sleep(0.05)
+            await batcher.stop()
+            return await asyncio.wait_for(pending, 1)
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(run())
+
+    def test_submit_requires_start(self):
+        """Test that submitting to a stopped batcher fails."""
+        batcher = MicroBatcher(lambda items: items)
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(batcher.submit(1))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
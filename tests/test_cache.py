@@ -0,0 +1,66 @@
+"""
+Tests for the in-process cache module.
+"""
+
+import time
+
+import pytest
+
+from knowledge_server.cache import LRUCache
+
+
+class TestLRUCache:
+    """Test cases for LRUCache."""
+
+    def test_get_put(self):
+        """Test storing and retrieving values."""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.get("missing") is None
+        assert cache.get("missing", 0) == 0
+
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest unused entry is evicted first."""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        assert len(cache) == 2
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_zero_size_disables(self):
+        """Test that a cache of size 0 stores nothing."""
+        cache = LRUCache(maxsize=0)
+        cache.put("a", 1)
+
+        assert len(cache) == 0
+        assert cache.get("a") is None
+
+    def test_ttl_expires_entries(self):
+        """Test that entries older than the TTL are treated as missing."""
+        cache = LRUCache(maxsize=2, ttl=0.01)
+        cache.put("a", 1)
+
+        assert cache.get("a") == 1
+        time.sleep(0.02)
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_stats(self):
+        """Test that hits and misses are counted."""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("b")
+
+        assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 2}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -28,6 +28,19 @@ class TestGraphStore:
         assert graph_store.db is not None
         assert graph_store.conn is not None
     
+    def test_reopen_existing_database(self):
+        """Test reopening a database that already has the schema."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, "test_db")
+            store = GraphStore(db_path)
+            store.add_document(doc_id="doc1", title="Doc", content="Content.")
+            store.close()
+            del store
+            
+            reopened = GraphStore(db_path)
+            assert reopened.get_document("doc1") is not None
+            reopened.close()
+    
     def test_add_document(self, graph_store):
         """Test adding a document."""
         graph_store.add_document(
@@ -40,6 +53,38 @@ class TestGraphStore:
         doc = graph_store.get_document("doc1")
         assert doc is not None
     
+    def test_add_document_updates_existing(self, graph_store):
+        """Test that adding an existing document updates it in place."""
+        graph_store.add_document(doc_id="doc1", title="Old", content="Old content.")
+        graph_store.add_document(doc_id="doc1", title="New", content="New content.")
+        
+        doc = graph_store.get_document("doc1")
+        assert doc["d.title"] == "New"
+        assert doc["d.content"] == "New content."
+
+    def test_lookup_cache_invalidated_on_write(self, graph_store):
+        """Test that cached lookups reflect later writes."""
+        graph_store.add_document(doc_id="doc1", title="Old", content="Old content.")
+        graph_store.add_entity(entity_id="e1", name="One", entity_type="Person")
+        graph_store.add_entity(entity_id="e2", name="Two", entity_type="Person")
+
+        assert graph_store.get_document("doc1")["d.title"] == "Old"
+        assert graph_store.get_related_entities("e1") == []
+
+        graph_store.add_document(doc_id="doc1", title="New", content="New content.")
+        graph_store.link_entities("e1", "e2", "knows")
+
+        assert graph_store.get_document("doc1")["d.title"] == "New"
+        assert len(graph_store.get_related_entities("e1")) == 1
+
+    def test_lookup_cache_returns_copies(self, graph_store):
+        """Test that modifying a returned result does not affect the cache."""
+        graph_store.add_document(doc_id="doc1", title="Title", content="Content.")
+
+        graph_store.get_document("doc1")["d.title"] = "Changed"
+
+        assert graph_store.get_document("doc1")["d.title"] == "Title"
+
     def test_add_entity(self, graph_store):
         """Test adding an entity."""
         graph_store.add_entity(
@@ -73,6 +118,19 @@ class TestGraphStore:
         entities = graph_store.get_document_entities("doc1")
         assert len(entities) >= 0  # May be empty depending on query
     
+    def test_link_document_entity_idempotent(self, graph_store):
+        """Test that linking the same pair twice creates one relationship."""
+        graph_store.add_document(doc_id="doc1", title="Doc", content="Content.")
+        graph_store.add_entity(
+            entity_id="entity1", name="Entity", entity_type="Organization"
+        )
+        
+        graph_store.link_document_entity("doc1", "entity1")
+        graph_store.link_document_entity("doc1", "entity1")
+        
+        entities = graph_store.get_document_entities("doc1")
+        assert [e["e.id"] for e in entities] == ["entity1"]
+    
     def test_link_entities(self, graph_store):
         """Test linking two entities."""
         graph_store.add_entity(
@@ -90,6 +148,44 @@ class TestGraphStore:
         
         related = graph_store.get_related_entities("entity1")
         assert isinstance(related, list)
+
+    def test_link_entities_idempotent(self, graph_store):
+        """Test that relinking with the same type creates one relationship."""
+        graph_store.add_entity(entity_id="entity1", name="One", entity_type="Person")
+        graph_store.add_entity(entity_id="entity2", name="Two", entity_type="Person")
+
+        graph_store.link_entities("entity1", "entity2", "knows")
+        graph_store.link_entities("entity1", "entity2", "knows")
+        graph_store.link_entities("entity1", "entity2", "works_with")
+
+        related = graph_store.get_related_entities("entity1")
+        assert sorted(r["r.relation_type"] for r in related) == ["knows", "works_with"]
+        assert len(graph_store.get_related_entities("entity1", "knows")) == 1
+    
+    def test_bulk_add(self, graph_store):
+        """Test bulk insertion of documents, entities and mentions."""
+        graph_store.bulk_add_documents([
+            {"id": "doc1", "title": "One", "content": "First."},
+            {"id": "doc2", "title": "Two", "content": "Second.", "url": "https://example.com"},
+        ])
+        graph_store.bulk_add_entities([
+            {"id": "entity1", "name": "Entity One", "entity_type": "Person"},
+            {"id": "entity2", "name": "Entity Two", "entity_type": "Organization"},
+        ])
+        graph_store.bulk_link_mentions([
+            ("doc1", "entity1"), ("doc1", "entity2"), ("doc1", "entity1"),
+        ])
+        
+        assert graph_store.get_document("doc2")["d.url"] == "https://example.com"
+        assert graph_store.get_entity("entity2")["e.name"] == "Entity Two"
+        entities = graph_store.get_document_entities("doc1")
+        assert sorted(e["e.id"] for e in entities) == ["entity1", "entity2"]
+    
+    def test_bulk_add_empty(self, graph_store):
+        """Test that empty bulk inserts are no-ops."""
+        graph_store.bulk_add_documents([])
+        graph_store.bulk_add_entities([])
+        graph_store.bulk_link_mentions([])
     
     def test_search_entities(self, graph_store):
         """Test searching entities."""
@@ -101,6 +197,21 @@ class TestGraphStore:
         
         results = graph_store.search_entities("Test")
         assert isinstance(results, list)
+    
+    def test_search_entities_large_result(self, graph_store):
+        """Test that large results convert to the same row dictionaries."""
+        for i in range(50):
+            graph_store.add_entity(
+                entity_id=f"entity{i}",
+                name=f"Bulk Entity {i}",
+                entity_type="Organization",
+            )
+        
+        results = graph_store.search_entities("Bulk")
+        
+        assert len(results) == 50
+        assert {r["e.id"] for r in results} == {f"entity{i}" for i in range(50)}
+        assert all(r["e.entity_type"] == "Organization" for r in results)
 
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@
 Tests for the RAG Engine module.
 """
 
+import asyncio
 import os
 import tempfile
 
@@ -12,57 +13,71 @@ from knowledge_server.vector_db.vector_store import VectorStore
 from knowledge_server.graph_db.graph_store import GraphStore
 
 
-# Skip tests if sentence-transformers model cannot be loaded (e.g., no network access)
-def get_rag_engine():
-    """Try to create a RAG engine, skip if model unavailable."""
+@pytest.fixture(scope="module")
+def shared_engine():
+    """Create one RAG engine and graph database for the whole module."""
     try:
         from knowledge_server.rag.rag_engine import RAGEngine
+    except ImportError:
+        pytest.skip("RAGEngine not available")
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Kuzu requires a path that doesn't exist yet
+        db_path = os.path.join(tmpdir, "test_graph_db")
+        graph_store = GraphStore(db_path)
+        
+        try:
+            engine = RAGEngine(VectorStore(dimension=384), graph_store)
+        except OSError as e:
+            graph_store.close()
+            if "huggingface" in str(e).lower() or "couldn't connect" in str(e).lower():
+                pytest.skip("Cannot load embedding model (no network access)")
+            raise
         
-        with tempfile.TemporaryDirectory() as tmpdir:
-            vector_store = VectorStore(dimension=384)
-            db_path = os.path.join(tmpdir, "test_graph_db")
-            graph_store = GraphStore(db_path)
-            engine = RAGEngine(vector_store, graph_store)
-            return engine, graph_store, tmpdir
-    except OSError as e:
-        if "huggingface" in str(e).lower() or "couldn't connect" in str(e).lower():
-            pytest.skip("Cannot load embedding model (no network access)")
-        raise
+        yield engine
+        
+        graph_store.close()
 
 
 class TestRAGEngine:
     """Test cases for RAGEngine."""
     
     @pytest.fixture
-    def rag_engine(self):
-        """Create a RAG engine with temporary storage."""
-        try:
-            from knowledge_server.rag.rag_engine import RAGEngine
-        except ImportError:
-            pytest.skip("RAGEngine not available")
-        
-        with tempfile.TemporaryDirectory() as tmpdir:
-            vector_store = VectorStore(dimension=384)
-            # Kuzu requires a path that doesn't exist yet
-            db_path = os.path.join(tmpdir, "test_graph_db")
-            graph_store = GraphStore(db_path)
-            
-            try:
-                engine = RAGEngine(vector_store, graph_store)
-            except OSError as e:
-                if "huggingface" in str(e).lower() or "couldn't connect" in str(e).lower():
-                    pytest.skip("Cannot load embedding model (no network access)")
-                raise
-            
-            yield engine
-            
-            graph_store.close()
+    def rag_engine(self, shared_engine):
+        """Give each test the shared engine with an empty vector store."""
+        # Documents left in the graph by earlier tests use other IDs, and
+        # retrieval only reaches documents through the vector store
+        shared_engine.vector_store = VectorStore(dimension=384)
+        return shared_engine
     
     def test_init(self, rag_engine):
         """Test RAGEngine initialization."""
         assert rag_engine.vector_store is not None
         assert rag_engine.graph_store is not None
         assert rag_engine.embedding_model is not None
+
+    def test_embedder_shared(self, rag_engine):
+        """Test that engines in one process share the loaded model."""
+        from knowledge_server.rag.rag_engine import RAGEngine
+
+        other = RAGEngine(VectorStore(dimension=384), rag_engine.graph_store)
+        assert other.embedding_model is rag_engine.embedding_model
+
+    def test_vector_id_stable(self):
+        """Test that vector keys do not depend on the process hash seed."""
+        from knowledge_server.rag.rag_engine import RAGEngine
+        
+        assert RAGEngine._vector_id("doc1") == 7997011735647381604
+        assert 0 <= RAGEngine._vector_id("doc2") < 2**63
+    
+    def test_context_char_budget(self):
+        """Test that the character estimate fills and truncates the budget."""
+        from knowledge_server.rag.rag_engine import _fit_chars
+        
+        parts = _fit_chars(["a" * 200, "b" * 300, "c" * 50], max_tokens=100)
+        
+        assert parts == ["a" * 200, "b" * 200]
+        assert _fit_chars(["a" * 350, "b" * 100], max_tokens=100) == ["a" * 350]
     
     def test_embed_text(self, rag_engine):
         """Test text embedding."""
@@ -81,28 +96,63 @@ class TestRAGEngine:
     def test_add_document(self, rag_engine):
         """Test adding a document."""
         rag_engine.add_document(
-            doc_id="doc1",
+            doc_id="add_doc1",
             title="Test Document",
             content="This is a test document about machine learning.",
         )
         
         # Verify in graph store
-        doc = rag_engine.graph_store.get_document("doc1")
+        doc = rag_engine.graph_store.get_document("add_doc1")
         assert doc is not None
         
         # Verify in vector store
         assert len(rag_engine.vector_store) > 0
     
+    def test_add_document_async(self, rag_engine):
+        """Test adding a document from a coroutine."""
+        asyncio.run(rag_engine.add_document_async(
+            doc_id="async1",
+            title="Async Document",
+            content="A document added asynchronously.",
+            entities=[{"id": "async_entity", "name": "Async", "type": "Concept"}],
+        ))
+        
+        assert rag_engine.graph_store.get_document("async1") is not None
+        entities = rag_engine.graph_store.get_document_entities("async1")
+        assert [e["e.id"] for e in entities] == ["async_entity"]
+        assert len(rag_engine.vector_store) == 1
+    
+    def test_add_documents(self, rag_engine):
+        """Test adding multiple documents in one call."""
+        rag_engine.add_documents([
+            {"doc_id": "batch1", "title": "One", "content": "First batch document."},
+            {"doc_id": "batch2", "title": "Two", "content": "Second batch document."},
+        ])
+        
+        assert rag_engine.graph_store.get_document("batch1") is not None
+        assert rag_engine.graph_store.get_document("batch2") is not None
+        assert len(rag_engine.vector_store) == 2
+    
+    def test_add_documents_duplicate_ids(self, rag_engine):
+        """Test that a repeated ID in one batch keeps its last version."""
+        rag_engine.add_documents([
+            {"doc_id": "dup", "title": "Old", "content": "Old content."},
+            {"doc_id": "dup", "title": "New", "content": "New content."},
+        ])
+        
+        assert rag_engine.graph_store.get_document("dup")["d.title"] == "New"
+        assert len(rag_engine.vector_store) == 1
+    
     def test_retrieve(self, rag_engine):
         """Test document retrieval."""
         # Add documents
         rag_engine.add_document(
-            doc_id="doc1",
+            doc_id="retrieve_doc1",
             title="Machine Learning",
             content="Machine learning is a subset of artificial intelligence.",
         )
         rag_engine.add_document(
-            doc_id="doc2",
+            doc_id="retrieve_doc2",
             title="Deep Learning",
             content="Deep learning uses neural networks with many layers.",
         )
@@ -113,10 +163,43 @@ class TestRAGEngine:
         assert len(results) == 2
         assert all("score" in r for r in results)
     
+    def test_retrieve_batch(self, rag_engine):
+        """Test retrieving results for several queries at once."""
+        rag_engine.add_document(
+            doc_id="batch_doc1",
+            title="Machine Learning",
+            content="Machine learning is a subset of artificial intelligence.",
+        )
+        rag_engine.add_document(
+            doc_id="batch_doc2",
+            title="Cooking",
+            content="Pasta is boiled in salted water.",
+        )
+        
+        results = rag_engine.retrieve_batch(["What is AI?", "How to cook pasta?"], top_k=1)
+        
+        assert len(results) == 2
+        assert results[1][0]["doc_id"] == "batch_doc2"
+        assert results[0] == rag_engine.retrieve("What is AI?", top_k=1)
+    
+    def test_retrieve_includes_document_entities(self, rag_engine):
+        """Test that results carry their document ID and entities."""
+        rag_engine.add_document(
+            doc_id="entities_doc1",
+            title="Python",
+            content="Python is a programming language.",
+            entities=[{"id": "python", "name": "Python", "type": "Language"}],
+        )
+        
+        result = rag_engine.retrieve("programming language", top_k=1)[0]
+        
+        assert result["doc_id"] == "entities_doc1"
+        assert [e["e.id"] for e in result["entities"]] == ["python"]
+    
     def test_get_context(self, rag_engine):
         """Test getting context for generation."""
         rag_engine.add_document(
-            doc_id="doc1",
+            doc_id="context_doc1",
             title="Test",
             content="This is test content for context generation.",
         )
@@ -127,5 +210,82 @@ class TestRAGEngine:
         assert len(context) > 0
 
 
+class FakeEmbedder:
+    """Embedder stand-in mapping known texts to fixed unit vectors."""
+    
+    VECTORS = {"query": 0, "match": 0, "unrelated": 1}
+    
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        single = isinstance(texts, str)
+        vectors = np.zeros((1 if single else len(texts), 384), dtype=np.float32)
+        for row, text in enumerate([texts] if single else texts):
+            vectors[row, self.VECTORS[text]] = 1.0
+        return vectors[0] if single else vectors
+
+
+class FakeCrossEncoder:
+    """Cross-encoder stand-in that records the pairs it scores."""
+    
+    def __init__(self, model_name, device=None, model_kwargs=None):
+        self.pairs = []
+    
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.pairs.extend(pairs)
+        return np.ones(len(pairs), dtype=np.float32)
+
+
+class TestRerankerPruning:
+    """Test cases for pruning candidates before reranking."""
+    
+    @pytest.fixture
+    def make_engine(self, monkeypatch, tmp_path):
+        """Build engines with stand-in models that need no downloads."""
+        from knowledge_server.rag import reranker
+        from knowledge_server.rag.rag_engine import RAGEngine
+        
+        monkeypatch.setattr(reranker, "CrossEncoder", FakeCrossEncoder)
+        graph_stores = []
+        
+        def make(prune_ratio):
+            graph_store = GraphStore(str(tmp_path / f"graph_{len(graph_stores)}"))
+            graph_stores.append(graph_store)
+            engine = RAGEngine(
+                VectorStore(dimension=384),
+                graph_store,
+                embedder=FakeEmbedder(),
+                use_reranker=True,
+                reranker_prune_ratio=prune_ratio,
+            )
+            engine.add_documents([
+                {"doc_id": "match", "title": "Match", "content": "match"},
+                {"doc_id": "unrelated", "title": "Unrelated", "content": "unrelated"},
+            ])
+            return engine
+        
+        yield make
+        for graph_store in graph_stores:
+            graph_store.close()
+    
+    def test_disabled_by_default(self, make_engine):
+        """Test that every candidate is reranked unless pruning is enabled."""
+        engine = make_engine(None)
+        
+        results = engine.retrieve("query", top_k=2, include_graph_context=False)
+        
+        assert all(r["reranked"] for r in results)
+        assert len(engine.reranker.model.pairs) == 2
+    
+    def test_prune_ratio_from_engine(self, make_engine):
+        """Test that weak candidates skip the cross-encoder when enabled."""
+        engine = make_engine(0.5)
+        
+        results = engine.retrieve("query", top_k=2, include_graph_context=False)
+        
+        assert [(r["doc_id"], r["reranked"]) for r in results] == [
+            ("match", True), ("unrelated", False),
+        ]
+        assert engine.reranker.model.pairs == [["query", "match"]]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
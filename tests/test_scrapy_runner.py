@@ -0,0 +1,125 @@
+"""
+Tests for the Scrapy runner URL checks.
+"""
+
+import json
+import os
+import socket
+import tempfile
+
+import pytest
+
+from knowledge_server.scrapy_server import runner
+from knowledge_server.scrapy_server.runner import (
+    is_private_ip,
+    parse_html,
+    validate_url,
+    write_json,
+)
+
+
+class TestURLValidation:
+    """Test cases for is_private_ip and validate_url."""
+    
+    @pytest.mark.parametrize("hostname", [
+        "localhost", "127.0.0.1", "10.1.2.3", "172.20.0.1", "192.168.1.1",
+        "169.254.169.254", "::1", "::ffff:127.0.0.1", "fe80::1",
+    ])
+    def test_private_addresses(self, hostname):
+        """Test that loopback and private literals are rejected."""
+        assert is_private_ip(hostname)
+    
+    def test_public_address(self):
+        """Test that a public literal is allowed."""
+        assert not is_private_ip("8.8.8.8")
+    
+    def test_hostname_resolving_to_loopback(self, monkeypatch):
+        """Test that a public-looking name pointing at 127.0.0.1 is rejected."""
+        def getaddrinfo(host, port):
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", 0))]
+        
+        monkeypatch.setattr(runner.socket, "getaddrinfo", getaddrinfo)
+        runner._RESOLVE_CACHE.clear()
+        try:
+            assert is_private_ip("rebind.example.com")
+            with pytest.raises(ValueError):
+                validate_url("http://rebind.example.com/")
+        finally:
+            runner._RESOLVE_CACHE.clear()
+    
+    def test_unresolvable_hostname(self, monkeypatch):
+        """Test that a name that fails to resolve is rejected and not cached."""
+        def getaddrinfo(host, port):
+            raise socket.gaierror("Name or service not known")
+        
+        monkeypatch.setattr(runner.socket, "getaddrinfo", getaddrinfo)
+        runner._RESOLVE_CACHE.clear()
+        try:
+            assert is_private_ip("missing.example.com")
+            with pytest.raises(ValueError):
+                validate_url("http://missing.example.com/")
+            assert len(runner._RESOLVE_CACHE) == 0
+        finally:
+            runner._RESOLVE_CACHE.clear()
+    
+    def test_allowed_domains(self, monkeypatch):
+        """Test that allowed domains match themselves and their subdomains."""
+        def getaddrinfo(host, port):
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("93.184.216.34", 0))]
+        
+        monkeypatch.setattr(runner.socket, "getaddrinfo", getaddrinfo)
+        runner._RESOLVE_CACHE.clear()
+        allowed = ["Example.com", "docs.python.org"]
+        
+        try:
+            assert validate_url("https://example.com/a", allowed)
+            assert validate_url("https://www.example.com/a", allowed)
+            assert validate_url("https://docs.python.org/3/", allowed)
+            for url in ("https://badexample.com/", "https://python.org/"):
+                with pytest.raises(ValueError):
+                    validate_url(url, allowed)
+        finally:
+            runner._RESOLVE_CACHE.clear()
+    
+    def test_rejects_other_schemes(self):
+        """Test that only http and https URLs are accepted."""
+        with pytest.raises(ValueError):
+            validate_url("file:///etc/passwd")
+
+
+
+class TestParseHTML:
+    """Test cases for parse_html."""
+    
+    def test_title_and_paragraphs(self):
+        """Test that the title and non-empty paragraphs are extracted."""
+        page = parse_html(
+            "<html><head><title> Page </title></head><body>"
+            "<p> First <b>bold</b> </p><p>  </p><div><p>Second</p></div>"
+            "</body></html>"
+        )
+        
+        assert page == {"title": "Page", "content": "First bold Second"}
+    
+    def test_empty_page(self):
+        """Test that an empty page yields no content."""
+        assert parse_html("") == {"title": "Untitled", "content": ""}
+
+
+class TestWriteJSON:
+    """Test cases for write_json."""
+    
+    def test_round_trip(self):
+        """Test that written results load back unchanged as UTF-8."""
+        results = [{"url": "https://example.com", "title": "Café", "content": "Text"}]
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "results.json")
+            write_json(results, path)
+            
+            with open(path, encoding="utf-8") as f:
+                assert json.load(f) == results
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
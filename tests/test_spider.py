@@ -0,0 +1,125 @@
+"""
+Tests for the Scrapy spiders.
+"""
+
+import pytest
+
+scrapy = pytest.importorskip("scrapy")
+from scrapy.http import HtmlResponse
+
+from knowledge_server.scrapy_server.spider import (
+    AllowedDomainLinkExtractor,
+    ContentSpider,
+    SimpleSpider,
+    extract_content,
+)
+
+
+PAGE = b"""
+<html>
+<head><title> Example Page </title></head>
+<body>
+<h1>Main <b>bold</b> heading</h1>
+<p>First paragraph.</p>
+<h2>Section</h2>
+<p>Second <a href="/next">link</a> paragraph.</p>
+<a href="https://example.com/other">Other</a>
+</body>
+</html>
+"""
+
+
+def make_response(body: bytes) -> HtmlResponse:
+    """Build an HTML response for the given body."""
+    return HtmlResponse(url="https://example.com/", body=body, encoding="utf-8")
+
+
+class TestContentSpider:
+    """Test cases for ContentSpider.parse_content."""
+
+    @pytest.fixture
+    def spider(self):
+        """Create a content spider."""
+        return ContentSpider(start_urls=["https://example.com/"])
+
+    def test_matches_css_selectors(self, spider):
+        """Test that the single-pass extraction matches the CSS selectors."""
+        response = make_response(PAGE)
+
+        item = next(spider.parse_content(response))
+
+        assert item["title"] == "Example Page"
+        assert item["content"] == " ".join(response.css("p::text").getall()).strip()
+        assert item["headings"] == response.css("h1::text, h2::text, h3::text").getall()
+        assert item["links"] == response.css("a::attr(href)").getall()
+
+    def test_title_falls_back_to_h1(self, spider):
+        """Test that pages without a title use their first h1."""
+        response = make_response(b"<html><body><h1>Heading</h1></body></html>")
+
+        assert next(spider.parse_content(response))["title"] == "Heading"
+
+    def test_untitled(self, spider):
+        """Test that pages without a title or h1 are marked Untitled."""
+        response = make_response(b"<html><body><p>Text</p></body></html>")
+
+        assert next(spider.parse_content(response))["title"] == "Untitled"
+
+    def test_content_capped(self, spider):
+        """Test that paragraph text stops at the content limit."""
+        response = make_response(b"<p>aaaa</p><p>bbbb</p><p>cccc</p>")
+
+        page = extract_content(response.selector.root, max_content_chars=7)
+
+        assert page["content"] == "aaaa bb"
+
+    def test_links_deduplicated(self, spider):
+        """Test that repeated links do not use up the link limit."""
+        body = b"".join(b'<a href="/same">x</a>' for _ in range(30)) + b'<a href="/other">y</a>'
+
+        item = next(spider.parse_content(make_response(body)))
+
+        assert item["links"] == ["/same", "/other"]
+
+
+class TestAllowedDomainLinkExtractor:
+    """Test cases for AllowedDomainLinkExtractor."""
+
+    def test_filters_hosts(self):
+        """Test that only allowed domains and their subdomains are followed."""
+        response = make_response(
+            b'<a href="https://example.com/a">a</a>'
+            b'<a href="https://docs.example.com/b">b</a>'
+            b'<a href="https://notexample.com/c">c</a>'
+            b'<a href="https://other.org/d">d</a>'
+        )
+        extractor = AllowedDomainLinkExtractor(["Example.com"])
+
+        urls = [link.url for link in extractor.extract_links(response)]
+
+        assert urls == ["https://example.com/a", "https://docs.example.com/b"]
+
+    def test_no_domains_allows_all(self):
+        """Test that an empty domain list follows every link."""
+        response = make_response(b'<a href="https://other.org/d">d</a>')
+
+        assert len(AllowedDomainLinkExtractor().extract_links(response)) == 1
+
+
+class TestSimpleSpider:
+    """Test cases for SimpleSpider.parse."""
+
+    def test_parse(self):
+        """Test that title and paragraph text are extracted."""
+        spider = SimpleSpider(start_urls=["https://example.com/"])
+
+        response = make_response(PAGE)
+
+        item = next(spider.parse(response))
+
+        assert item["title"] == "Example Page"
+        assert item["content"] == " ".join(response.css("p::text").getall()).strip()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -11,6 +11,10 @@ import pytest
 from knowledge_server.vector_db.vector_store import VectorStore
 
 
+# Seeded, so every run uses the same vectors
+_RNG = np.random.default_rng(0)
+
+
 class TestVectorStore:
     """Test cases for VectorStore."""
     
@@ -25,7 +29,7 @@ class TestVectorStore:
         """Test adding vectors."""
         store = VectorStore(dimension=128)
         
-        vectors = np.random.rand(5, 128).astype(np.float32)
+        vectors = _RNG.standard_normal((5, 128), dtype=np.float32)
         texts = [f"Text {i}" for i in range(5)]
         
         ids = store.add(vectors, texts)
@@ -33,12 +37,32 @@ class TestVectorStore:
         assert len(ids) == 5
         assert len(store) == 5
     
+    def test_add_keeps_caller_vectors(self):
+        """Test that normalizing for the index leaves the input unchanged."""
+        store = VectorStore(dimension=128)
+        
+        vectors = _RNG.standard_normal((5, 128), dtype=np.float32) * 10
+        original = vectors.copy()
+        store.add(vectors)
+        store.search(vectors[0], top_k=1)
+        
+        np.testing.assert_array_equal(vectors, original)
+    
+    def test_dimension_mismatch(self):
+        """Test that vectors of the wrong dimension are rejected."""
+        store = VectorStore(dimension=128)
+        
+        with pytest.raises(ValueError):
+            store.add(_RNG.standard_normal((2, 64), dtype=np.float32))
+        with pytest.raises(ValueError):
+            store.search(_RNG.standard_normal(64, dtype=np.float32))
+    
     def test_search(self):
         """Test vector search."""
         store = VectorStore(dimension=128)
         
         # Add some vectors
-        vectors = np.random.rand(10, 128).astype(np.float32)
+        vectors = _RNG.standard_normal((10, 128), dtype=np.float32)
         texts = [f"Text {i}" for i in range(10)]
         store.add(vectors, texts)
         
@@ -50,6 +74,73 @@ class TestVectorStore:
         # First result should be the same vector
         assert results[0][2] == "Text 0"
     
+    def test_batch_search(self):
+        """Test that batch search matches one search per query."""
+        store = VectorStore(dimension=128)
+        
+        vectors = _RNG.standard_normal((10, 128), dtype=np.float32)
+        store.add(vectors, [f"Text {i}" for i in range(10)])
+        
+        batch = store.batch_search(vectors[:3], top_k=2)
+        
+        assert len(batch) == 3
+        assert [results[0][2] for results in batch] == ["Text 0", "Text 1", "Text 2"]
+        assert batch[1] == store.search(vectors[1], top_k=2)
+    
+    def test_exact_search_small_store(self):
+        """Test that a small store returns the true nearest neighbours."""
+        store = VectorStore(dimension=128)
+        
+        vectors = _RNG.standard_normal((500, 128), dtype=np.float32)
+        store.add(vectors, [f"Text {i}" for i in range(500)])
+        query = _RNG.standard_normal(128, dtype=np.float32)
+        
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = np.argsort(-(normalized @ query))[:10]
+        assert [r[0] for r in store.search(query, top_k=10)] == expected.tolist()
+    
+    def test_cosine_ignores_vector_length(self):
+        """Test that cosine distances do not depend on vector length."""
+        store = VectorStore(dimension=128)
+        
+        vectors = _RNG.standard_normal((5, 128), dtype=np.float32)
+        store.add(vectors * 10, [f"Text {i}" for i in range(5)])
+        
+        results = store.search(vectors[1] * 0.1, top_k=5)
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = 1 - normalized @ normalized[1]
+        
+        assert results[0][2] == "Text 1"
+        for id_, distance, _ in results:
+            assert distance == pytest.approx(expected[id_], abs=1e-5)
+    
+    def test_int8_index(self):
+        """Test that an int8 quantized index still finds the nearest vector."""
+        store = VectorStore(dimension=128, dtype="i8")
+        
+        vectors = _RNG.standard_normal((10, 128), dtype=np.float32)
+        texts = [f"Text {i}" for i in range(10)]
+        store.add(vectors, texts)
+        
+        results = store.search(vectors[3], top_k=1)
+        assert results[0][2] == "Text 3"
+    
+    def test_float16_index(self):
+        """Test that a half-precision index still finds the nearest vector."""
+        store = VectorStore(dimension=128, dtype="f16")
+        
+        vectors = _RNG.standard_normal((10, 128), dtype=np.float32)
+        store.add(vectors, [f"Text {i}" for i in range(10)])
+        
+        results = store.search(vectors[3], top_k=1)
+        assert results[0][2] == "Text 3"
+        assert results[0][1] == pytest.approx(0, abs=1e-2)
+    
+    def test_int8_requires_cosine(self):
+        """Test that int8 storage is rejected for metrics it cannot represent."""
+        with pytest.raises(ValueError):
+            VectorStore(dimension=128, metric="ip", dtype="i8")
+    
     def test_save_load(self):
         """Test saving and loading index."""
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -57,7 +148,7 @@ class TestVectorStore:
             
             # Create and save
             store = VectorStore(dimension=128, db_path=db_path)
-            vectors = np.random.rand(5, 128).astype(np.float32)
+            vectors = _RNG.standard_normal((5, 128), dtype=np.float32)
             texts = [f"Text {i}" for i in range(5)]
             store.add(vectors, texts)
             store.save()
@@ -67,12 +158,86 @@ class TestVectorStore:
             store2.load(db_path)
             
             assert len(store2) == 5
+            assert not store2.dirty
+
+    def test_load_restores_texts_and_next_id(self):
+        """Test that reloaded stores keep their texts and continue IDs."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, "test_index.usearch")
+            
+            store = VectorStore(dimension=128, db_path=db_path)
+            store.add(_RNG.standard_normal((2, 128), dtype=np.float32), ["Text 0", "Café"])
+            store.save()
+            
+            store2 = VectorStore(dimension=128, db_path=db_path)
+            assert store2._id_to_text == {0: "Text 0", 1: "Café"}
+            assert store2.add(_RNG.standard_normal((1, 128), dtype=np.float32)) == [2]
+
+    def test_mmap_load_then_modify(self):
+        """Test that a memory-mapped index can be searched, modified and saved."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, "test_index.usearch")
+            
+            vectors = _RNG.standard_normal((4, 128), dtype=np.float32)
+            store = VectorStore(dimension=128, db_path=db_path)
+            store.add(vectors[:3], ["A", "B", "C"])
+            store.save()
+            
+            mapped = VectorStore(dimension=128, db_path=db_path, mmap=True)
+            assert mapped.search(vectors[1], top_k=1)[0][2] == "B"
+            
+            mapped.add(vectors[3:], ["D"])
+            mapped.delete([0])
+            mapped.save()
+            
+            reloaded = VectorStore(dimension=128, db_path=db_path, mmap=False)
+            assert len(reloaded) == 3
+            assert reloaded.search(vectors[3], top_k=1)[0][2] == "D"
+    
+    def test_save_skipped_when_clean(self):
+        """Test that saving an unchanged store writes nothing."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, "test_index.usearch")
+
+            store = VectorStore(dimension=128, db_path=db_path)
+            store.save()
+            assert not os.path.exists(db_path)
+
+            store.add(_RNG.standard_normal((1, 128), dtype=np.float32), ["Text"])
+            assert store.dirty
+            store.save()
+            assert os.path.exists(db_path)
+            assert not store.dirty
+
+    def test_add_existing_id_replaces(self):
+        """Test that adding an existing ID replaces its vector and text."""
+        store = VectorStore(dimension=128)
+        
+        store.add(_RNG.standard_normal((1, 128), dtype=np.float32), ["Old"], ids=[7])
+        new_vector = _RNG.standard_normal((1, 128), dtype=np.float32)
+        store.add(new_vector, ["New"], ids=[7])
+        
+        assert len(store) == 1
+        assert store.search(new_vector[0], top_k=1)[0][2] == "New"
+    
+    def test_search_cache_invalidated_on_add(self):
+        """Test that repeated searches are cached until the store changes."""
+        store = VectorStore(dimension=128)
+        vectors = _RNG.standard_normal((3, 128), dtype=np.float32)
+        store.add(vectors[1:], ["B", "C"])
+        
+        first = store.search(vectors[0], top_k=1)
+        assert store.search(vectors[0], top_k=1) == first
+        assert store.cache_stats()["hits"] == 1
+        
+        store.add(vectors[:1], ["A"], ids=[9])
+        assert store.search(vectors[0], top_k=1)[0][2] == "A"
     
     def test_delete(self):
         """Test deleting vectors."""
         store = VectorStore(dimension=128)
         
-        vectors = np.random.rand(5, 128).astype(np.float32)
+        vectors = _RNG.standard_normal((5, 128), dtype=np.float32)
         texts = [f"Text {i}" for i in range(5)]
         ids = store.add(vectors, texts)
         
@@ -81,6 +246,42 @@ class TestVectorStore:
         
         # Text mapping should be removed
         assert ids[0] not in store._id_to_text
+    
+    def test_delete_removes_from_index(self):
+        """Test that deleted vectors are no longer returned by search."""
+        store = VectorStore(dimension=128)
+        
+        vectors = _RNG.standard_normal((5, 128), dtype=np.float32)
+        ids = store.add(vectors, [f"Text {i}" for i in range(5)])
+        assert store.search(vectors[0], top_k=1)[0][0] == ids[0]
+        
+        store.delete([ids[0], 99])
+        
+        assert len(store) == 4
+        assert ids[0] not in [r[0] for r in store.search(vectors[0], top_k=5)]
+        assert ids[0] not in store
+        assert ids[1] in store
+    
+    def test_delete_text_without_vector(self):
+        """Test that deleting a text whose vector is gone still counts as a change."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, "test_index.usearch")
+            store = VectorStore(dimension=128, db_path=db_path)
+            
+            vectors = _RNG.standard_normal((2, 128), dtype=np.float32)
+            ids = store.add(vectors, ["A", "B"])
+            assert store.search(vectors[0], top_k=1)[0][2] == "A"
+            # Leave only the text mapping behind for the first ID
+            store.index.remove(ids[0])
+            store.save()
+            
+            store.delete([ids[0]])
+            
+            assert store.dirty
+            assert "A" not in [r[2] for r in store.search(vectors[0], top_k=2)]
+            store.save()
+            reloaded = VectorStore(dimension=128, db_path=db_path)
+            assert ids[0] not in reloaded._id_to_text
 
 
 if __name__ == "__main__":